@@ -1,13 +1,14 @@
-from datetime import timedelta
-from decimal import Decimal
-from math import ceil
+from datetime import datetime, time, timedelta
+from decimal import ROUND_HALF_UP, Decimal
 
+from django.conf import settings
 from django.contrib.auth import authenticate, get_user_model
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
-from django.core.files.storage import default_storage
-from django.db import transaction, models
-from django.db.models import Q, Sum
+from django.db import transaction
+from django.db.models import Count, Q, Sum, prefetch_related_objects
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils.dateparse import parse_date, parse_datetime
 from django.utils import timezone
 from django.utils.text import slugify
 from rest_framework import permissions, status
@@ -18,7 +19,26 @@ from rest_framework_simplejwt.tokens import AccessToken
 from django.core.mail import EmailMessage
 
 from orders.models import Order, OrderItem
-from products.models import Category, Product, Offer
+from orders.stock import OutOfStock, line_quantities, release_orders, reserve_order, reserve_stock, save_order
+from products.catalog import catalog_stamp
+from products.categories import filter_by_category
+from products.facets import compute_facets, filter_in_stock
+from products import lookup
+from products.models import Category, EffectivePrice, Product, Offer
+from products.pricing import (
+    active_offers,
+    filter_by_price,
+    parse_price,
+    refresh_effective_prices,
+    refresh_stale_prices,
+    resolve_discounts,
+)
+from products.search import search_products
+from . import catalog_export, images, snapshots, versioning
+from .storage import UploadRejected, check_upload
+from .conditional import make_etag, not_modified, set_validators
+from .pagination import paginate, wants_pagination
+from .response_cache import cache_catalog_response, cache_stats, reset_cache_stats
 
 User = get_user_model()
 
@@ -67,11 +87,14 @@ def serialize_category(cat):
     return {"_id": cat.id, "id": cat.id, "name": cat.nombre, "slug": cat.slug}
 
 
-def serialize_product(prod, request=None):
-    images = []
+def serialize_product(prod, request=None, discounts=None):
+    image_urls = []
     if prod.imagen:
-        images.append(_abs_media(request, prod.imagen.url))
-    discount = resolve_discount_for_product(prod)
+        image_urls.append(_abs_media(request, prod.imagen.url))
+    if discounts is None:
+        discount = resolve_discount_for_product(prod)
+    else:
+        discount = discounts.get(prod.id)
     final_price = discount["final_price"] if discount else prod.precio
     return {
         "_id": prod.id,
@@ -82,15 +105,26 @@ def serialize_product(prod, request=None):
         "priceOriginal": float(prod.precio),
         "discount": discount["meta"] if discount else None,
         "description": prod.descripcion or "",
-        "images": images,
+        "images": image_urls,
+        "imageSet": images.image_set(request, prod.imagen),
         "category": serialize_category(prod.categoria),
         "stock": prod.stock,
         "active": prod.activo,
         "createdAt": prod.creado_en.isoformat() if prod.creado_en else None,
-        "updatedAt": None,
+        "updatedAt": prod.actualizado_en.isoformat() if prod.actualizado_en else None,
     }
 
 
+# atributo con los items ya cargados (``Prefetch("items", ..., to_attr=ORDER_ITEMS_ATTR)``
+# o asignado a mano al crear el pedido); sin él se usa ``order.items.all()``
+ORDER_ITEMS_ATTR = "item_list"
+
+
+def order_items(order):
+    items = getattr(order, ORDER_ITEMS_ATTR, None)
+    return order.items.all() if items is None else items
+
+
 def serialize_order(order, request=None):
     status_labels = {
         "created": "Creado",
@@ -102,7 +136,7 @@ def serialize_order(order, request=None):
         "draft": "Borrador",
     }
     items = []
-    for item in order.items.all():
+    for item in order_items(order):
         items.append({
             "productId": item.product_id,
             "name": item.product.nombre if item.product else "",
@@ -111,7 +145,7 @@ def serialize_order(order, request=None):
             "subtotal": float(item.subtotal),
         })
     totals = {
-        "items": sum(it["qty"] for it in items),
+        "items": order.item_count,
         "amount": float(order.total or 0),
     }
     return {
@@ -130,9 +164,19 @@ def serialize_order(order, request=None):
             "phone": order.telefono,
         },
         "createdAt": order.creado_en.isoformat() if order.creado_en else None,
+        "updatedAt": order.actualizado_en.isoformat() if order.actualizado_en else None,
     }
 
 
+PRODUCT_SORTS = {
+    "newest": ("-creado_en", "-id"),
+    "relevance": ("search_rank", "-creado_en", "-id"),
+    "price": ("precio_efectivo__precio_final", "id"),
+    "-price": ("-precio_efectivo__precio_final", "-id"),
+    "price_desc": ("-precio_efectivo__precio_final", "-id"),
+}
+
+
 def resolve_category(value):
     if not value:
         return None
@@ -142,39 +186,55 @@ def resolve_category(value):
 
 
 def resolve_product(value):
-    if not value:
-        return None
-    try:
-        return Product.objects.get(pk=value)
-    except Exception:
-        return Product.objects.filter(slug=value).first()
+    return lookup.resolve_product(value)
 
 
 def resolve_discount_for_product(product: Product):
-    now = timezone.now()
-    offers = Offer.objects.filter(activo=True).filter(
-        models.Q(producto=product) | models.Q(categoria=product.categoria)
+    return resolve_discounts([product]).get(product.id)
+
+
+def serialize_products(products, request=None):
+    products = list(products)
+    discounts = resolve_discounts(products)
+    return [serialize_product(p, request, discounts=discounts) for p in products]
+
+
+def catalog_validators(request, scope):
+    token, last_modified = catalog_stamp()
+    params = sorted((k, v) for k in request.query_params for v in request.query_params.getlist(k))
+    return make_etag(scope, token, params), last_modified
+
+
+def product_validators(product):
+    """ETag/Last-Modified del detalle sin serializar: producto + su precio materializado."""
+    price = EffectivePrice.objects.filter(product_id=product.pk).first()
+    if price is None or (price.vigente_hasta and price.vigente_hasta <= timezone.now()):
+        refresh_effective_prices([product.pk])
+        price = EffectivePrice.objects.filter(product_id=product.pk).first()
+    etag = make_etag(
+        "product",
+        product.pk,
+        product.actualizado_en,
+        price.precio_final if price else None,
+        price.oferta_id if price else None,
+        price.actualizado_en if price else None,
+        versioning.table_version(Category),
     )
-    offers = offers.filter(
-        models.Q(empieza__isnull=True) | models.Q(empieza__lte=now),
-        models.Q(termina__isnull=True) | models.Q(termina__gte=now),
-    ).order_by("-porcentaje")
-    offer = offers.first()
-    if not offer:
-        return None
-    pct = offer.porcentaje or Decimal("0")
-    final_price = product.precio * (Decimal("1.00") - (pct / Decimal("100")))
-    if final_price < 0:
-        final_price = Decimal("0.00")
-    return {
-        "final_price": final_price,
-        "meta": {
-            "percent": float(pct),
-            "label": f"-{pct}%",
-            "offerId": offer.id,
-            "offerSlug": offer.slug,
-        },
-    }
+    moments = [m for m in (product.actualizado_en, price.actualizado_en if price else None) if m]
+    return etag, max(moments) if moments else None
+
+
+def order_validators(order):
+    # los items cambian junto con order.actualizado_en; producto y usuario se serializan embebidos
+    etag = make_etag(
+        "order",
+        order.pk,
+        order.actualizado_en,
+        versioning.table_version(OrderItem),
+        versioning.table_version(Product),
+        versioning.table_version(User),
+    )
+    return etag, order.actualizado_en
 
 
 def _escape_pdf_text(text: str) -> str:
@@ -191,7 +251,7 @@ def build_invoice_pdf(order) -> bytes:
     lines.append(f"Envio: {addr}")
     lines.append("")
     lines.append("Items:")
-    for item in order.items.all():
+    for item in order_items(order):
         lines.append(f"- {item.product.nombre} x{item.cantidad} @ ${item.precio_unitario} = ${item.subtotal}")
     lines.append("")
     lines.append(f"Total: ${order.total}")
@@ -334,6 +394,11 @@ class AccountProfileView(APIView):
         profile_phone = request.data.get("profilePhone")
         remove_avatar = str(request.data.get("removeAvatar") or "").lower() in {"1", "true", "yes"}
         avatar_file = request.FILES.get("avatar")
+        if avatar_file:
+            try:
+                check_upload(avatar_file)
+            except UploadRejected as exc:
+                return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
 
         if email:
             normalized_email = str(email).strip().lower()
@@ -396,37 +461,174 @@ class AccountPasswordView(APIView):
 class ProductListView(APIView):
     permission_classes = [permissions.AllowAny]
 
+    @cache_catalog_response
     def get(self, request):
+        etag, last_modified = catalog_validators(request, "products")
+        cached = not_modified(request, etag, last_modified)
+        if cached:
+            return cached
         q = (request.query_params.get("q") or request.query_params.get("search") or "").strip()
         category = request.query_params.get("category") or request.query_params.get("cat")
-        page = max(1, int(request.query_params.get("page") or 1))
-        limit = max(1, min(100, int(request.query_params.get("limit") or 20)))
+        in_stock = request.query_params.get("inStock")
+        in_stock = None if in_stock in (None, "") else in_stock.lower() in {"1", "true", "yes"}
+        facets = (request.query_params.get("facets") or "").lower()
 
-        qs = Product.objects.filter(activo=True).select_related("categoria")
+        base = Product.objects.filter(activo=True).select_related("categoria")
         if q:
-            q_slug = slugify(q)
-            lookup = Q(nombre__icontains=q) | Q(descripcion__icontains=q)
-            if q_slug:
-                lookup |= Q(slug__icontains=q_slug)
-            qs = qs.filter(lookup)
+            base = search_products(base, q)
+        min_price = parse_price(request.query_params.get("minPrice"))
+        max_price = parse_price(request.query_params.get("maxPrice"))
+        sort = request.query_params.get("sort") or ("relevance" if q else "newest")
+        ordering = PRODUCT_SORTS.get(sort, PRODUCT_SORTS["newest"])
+        if sort == "relevance" and not q:
+            ordering = PRODUCT_SORTS["newest"]
+        if (
+            facets
+            or min_price is not None
+            or max_price is not None
+            or ordering[0].lstrip("-").startswith("precio_efectivo")
+        ):
+            refresh_stale_prices()
+
+        if facets == "only":
+            data = {"facets": compute_facets(base, category, min_price, max_price, in_stock)}
+            return set_validators(Response(data), etag, last_modified)
+
+        qs = filter_in_stock(base, in_stock)
         if category:
-            qs = qs.filter(categoria__slug=category)
+            qs = filter_by_category(qs, category)
+        qs = filter_by_price(qs, min_price, max_price)
 
-        total = qs.count()
-        start = (page - 1) * limit
-        items = qs.order_by("-creado_en")[start:start + limit]
-        data = [serialize_product(p, request) for p in items]
-        return Response({"items": data, "total": total, "page": page, "pages": ceil(total / limit) if total else 1})
+        data = paginate(request, qs, ordering, lambda rows: serialize_products(rows, request))
+        if facets in {"1", "true", "yes"}:
+            data["facets"] = compute_facets(base, category, min_price, max_price, in_stock)
+        return set_validators(Response(data), etag, last_modified)
 
 
 class ProductDetailView(APIView):
     permission_classes = [permissions.AllowAny]
 
+    @cache_catalog_response
     def get(self, request, pk):
         prod = resolve_product(pk)
         if not prod:
             return Response({"error": "Producto no encontrado"}, status=status.HTTP_404_NOT_FOUND)
-        return Response(serialize_product(prod, request))
+        etag, last_modified = product_validators(prod)
+        cached = not_modified(request, etag, last_modified)
+        if cached:
+            return cached
+        return set_validators(Response(serialize_product(prod, request)), etag, last_modified)
+
+
+class ProductBatchView(APIView):
+    permission_classes = [permissions.AllowAny]
+    max_items = 100
+
+    @staticmethod
+    def _values(params, name):
+        values = []
+        for raw in params.getlist(name):
+            values.extend(v.strip() for v in raw.split(",") if v.strip())
+        return values
+
+    @cache_catalog_response
+    def get(self, request):
+        params = request.query_params
+        values = list(dict.fromkeys(self._values(params, "ids") + self._values(params, "slugs")))
+        if not values:
+            return Response({"error": "Indica ids o slugs"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(values) > self.max_items:
+            return Response(
+                {"error": f"Maximo {self.max_items} productos por consulta"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        etag, last_modified = catalog_validators(request, "products-batch")
+        cached = not_modified(request, etag, last_modified)
+        if cached:
+            return cached
+        found = lookup.resolve_products(values)
+        products = list({found[v].pk: found[v] for v in values if v in found}.values())
+        data = {
+            "items": serialize_products(products, request),
+            "missing": [value for value in values if value not in found],
+        }
+        return set_validators(Response(data), etag, last_modified)
+
+
+def parse_since(value):
+    """Acepta fecha (``2025-01-31``) o fecha/hora ISO; sin zona se asume la del servidor."""
+    value = (value or "").strip().replace(" ", "+")
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(value)
+        moment = datetime.combine(day, time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+class ProductExportView(APIView):
+    """Catálogo completo en streaming: memoria constante sin importar el tamaño.
+
+    ``/api/catalog/export.ndjson`` (un producto por línea, por defecto) o
+    ``/api/catalog/export.json`` (un objeto con ``items``). El sufijo ``.gz``
+    entrega el archivo comprimido; sin él se comprime igual si el cliente manda
+    ``Accept-Encoding: gzip``. Con ``?since=`` incluye también los inactivos
+    modificados desde esa fecha (``active: false``) para poder darlos de baja;
+    salvo para staff, de esos solo se entrega ``id`` y ``active``.
+    """
+
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, fmt=None, gz=None):
+        fmt = fmt or "ndjson"
+        qs = Product.objects.select_related("categoria").order_by("pk")
+        since = request.query_params.get("since")
+        if since:
+            try:
+                since = parse_since(since)
+            except ValueError:
+                return Response({"error": "Fecha since invalida"}, status=status.HTTP_400_BAD_REQUEST)
+            qs = qs.filter(Q(actualizado_en__gte=since) | Q(precio_efectivo__actualizado_en__gte=since))
+        else:
+            qs = qs.filter(activo=True)
+        refresh_stale_prices()
+
+        generated = timezone.now()
+        chunks = catalog_export.iter_chunks(qs)
+
+        is_staff = bool(request.user and request.user.is_staff)
+
+        def serialize(rows):
+            if is_staff:
+                return serialize_products(rows, request)
+            active = iter(serialize_products([p for p in rows if p.activo], request))
+            return [next(active) if p.activo else {"id": p.pk, "active": False} for p in rows]
+
+        if fmt == "json":
+            meta = {"generatedAt": generated.isoformat(), "since": since.isoformat() if since else None}
+            body = catalog_export.iter_json_array(chunks, serialize, meta)
+            content_type = "application/json"
+        else:
+            body = catalog_export.iter_ndjson(chunks, serialize)
+            content_type = "application/x-ndjson"
+
+        filename = f"catalogo-{generated:%Y%m%d%H%M%S}.{fmt}"
+        accepts_gzip = "gzip" in request.META.get("HTTP_ACCEPT_ENCODING", "")
+        if gz or accepts_gzip:
+            body = catalog_export.gzip_stream(body)
+        if gz:
+            response = StreamingHttpResponse(body, content_type="application/gzip")
+            filename += ".gz"
+        else:
+            response = StreamingHttpResponse(body, content_type=f"{content_type}; charset=utf-8")
+            if accepts_gzip:
+                response["Content-Encoding"] = "gzip"
+            response["Vary"] = "Accept-Encoding"
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        response["X-Generated-At"] = generated.isoformat()
+        return response
 
 
 class OrderCreateView(APIView):
@@ -440,59 +642,83 @@ class OrderCreateView(APIView):
         if not isinstance(raw_items, list) or not raw_items:
             return Response({"error": "Carrito vacio"}, status=status.HTTP_400_BAD_REQUEST)
 
-        built_items = []
+        lines = []
         for raw in raw_items:
-            pid = raw.get("productId") or raw.get("product_id") or raw.get("id") or raw.get("slug")
-            product = resolve_product(pid)
-            qty = max(1, int(raw.get("qty") or raw.get("cantidad") or 1))
-            price = raw.get("price")
-            if price is None and product:
-                price = product.precio
-            price = Decimal(str(price or 0))
-            name = raw.get("name") or (product.nombre if product else "")
-            if not name:
+            if not isinstance(raw, dict):
                 continue
-            built_items.append({"product": product, "qty": qty, "price": price, "name": name})
-
-        if not built_items:
+            pid = raw.get("productId") or raw.get("product_id") or raw.get("id") or raw.get("slug")
+            try:
+                qty = max(1, int(raw.get("qty") or raw.get("cantidad") or 1))
+            except (TypeError, ValueError):
+                return Response({"error": "Cantidad invalida"}, status=status.HTTP_400_BAD_REQUEST)
+            lines.append((pid, qty, raw.get("name")))
+
+        # una consulta para todos los productos y otra para sus ofertas vigentes
+        found = lookup.resolve_products([pid for pid, _, _ in lines])
+        discounts = resolve_discounts(found.values())
+        items = []
+        for pid, qty, name in lines:
+            product = found.get(str(pid).strip()) if pid not in (None, "") else None
+            if product is None:
+                if not name:
+                    continue
+                return Response({"error": "Producto no encontrado"}, status=status.HTTP_400_BAD_REQUEST)
+            discount = discounts.get(product.pk)
+            price = discount["final_price"] if discount else product.precio
+            items.append(OrderItem(
+                product=product,
+                cantidad=qty,
+                precio_unitario=Decimal(price).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP),
+            ))
+
+        if not items:
             return Response({"error": "Carrito vacio"}, status=status.HTTP_400_BAD_REQUEST)
 
-        with transaction.atomic():
-            order = Order.objects.create(
-                user=request.user,
-                nombre=shipping.get("name") or request.user.name or request.user.username,
-                email=request.user.email or "",
-                direccion=shipping.get("address") or "",
-                ciudad=shipping.get("city") or "",
-                estado="",
-                cp=shipping.get("zip") or "",
-                telefono=shipping.get("phone") or request.user.phone,
-                nota="",
-                status="created",
-                total=Decimal("0.00"),
-            )
-            for item in built_items:
-                if item["product"] is None:
-                    transaction.set_rollback(True)
-                    return Response({"error": "Producto no encontrado"}, status=status.HTTP_400_BAD_REQUEST)
-                OrderItem.objects.create(
-                    order=order,
-                    product=item["product"],
-                    cantidad=item["qty"],
-                    precio_unitario=item["price"],
-                )
-            order.recalc_total()
-
-        order = Order.objects.prefetch_related("items__product").select_related("user").get(pk=order.pk)
+        try:
+            with transaction.atomic():
+                # primero el stock: si no alcanza no se escribe nada más
+                reserve_stock(line_quantities((item.product_id, item.cantidad) for item in items))
+                order = self._create_order(request, shipping, items)
+        except OutOfStock as exc:
+            return Response({"error": str(exc), "items": exc.as_data()}, status=status.HTTP_409_CONFLICT)
+
+        # se serializa con lo que ya está en memoria: sin volver a leer el pedido
+        setattr(order, ORDER_ITEMS_ATTR, items)
         send_invoice_email(order, request)
         return Response({"order": serialize_order(order, request)}, status=status.HTTP_201_CREATED)
 
+    def _create_order(self, request, shipping, items):
+        order = Order.objects.create(
+            user=request.user,
+            nombre=shipping.get("name") or request.user.name or request.user.username,
+            email=request.user.email or "",
+            direccion=shipping.get("address") or "",
+            ciudad=shipping.get("city") or "",
+            estado="",
+            cp=shipping.get("zip") or "",
+            telefono=shipping.get("phone") or request.user.phone,
+            nota="",
+            status="created",
+            total=sum((item.subtotal for item in items), Decimal("0.00")),
+            item_count=sum(item.cantidad for item in items),
+            stock_reservado=True,
+        )
+        for item in items:
+            item.order = order
+        OrderItem.objects.bulk_create(items)
+        versioning.bump(OrderItem)
+        return order
+
 
 class MyOrdersView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
         qs = Order.objects.filter(user=request.user).prefetch_related("items__product").order_by("-creado_en")
+        if wants_pagination(request):
+            data = paginate(request, qs, ("-creado_en", "-id"), lambda rows: [serialize_order(o, request) for o in rows])
+            data["orders"] = data.pop("items")
+            return Response(data)
         return Response({"orders": [serialize_order(o, request) for o in qs]})
 
 
@@ -500,13 +726,18 @@ class OrderDetailView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request, pk):
-        order = Order.objects.prefetch_related("items__product").select_related("user").filter(pk=pk).first()
+        order = Order.objects.select_related("user").filter(pk=pk).first()
         if not order:
             return Response({"error": "Pedido no encontrado"}, status=status.HTTP_404_NOT_FOUND)
         is_owner = order.user_id == request.user.id
         if not is_owner and not request.user.is_staff:
             return Response({"error": "Sin permiso"}, status=status.HTTP_403_FORBIDDEN)
-        return Response({"order": serialize_order(order, request)})
+        etag, last_modified = order_validators(order)
+        cached = not_modified(request, etag, last_modified)
+        if cached:
+            return cached
+        prefetch_related_objects([order], "items__product")
+        return set_validators(Response({"order": serialize_order(order, request)}), etag, last_modified)
 
 
 class OrderMarkPaidView(APIView):
@@ -522,7 +753,7 @@ class OrderMarkPaidView(APIView):
         if order.status != "approved":
             return Response({"error": "Tu pedido aun no fue aprobado por el administrador"}, status=status.HTTP_400_BAD_REQUEST)
         order.status = "paid"
-        order.save(update_fields=["status"])
+        order.save(update_fields=["status", "actualizado_en"])
         send_invoice_email(order, request)
         return Response({"order": serialize_order(order, request)})
 
@@ -539,14 +770,15 @@ class AdminOverviewView(APIView):
         since = timezone.now() - timedelta(days=30)
         paid_states = ["paid", "shipped", "delivered"]
         recent = Order.objects.filter(creado_en__gte=since, status__in=paid_states)
-        revenue = recent.aggregate(total=Sum("total")).get("total") or Decimal("0.00")
+        # total e item_count están desnormalizados: un solo aggregate, sin tocar los items
+        stats = recent.aggregate(revenue=Sum("total"), orders=Count("pk"), items=Sum("item_count"))
         last_orders = Order.objects.prefetch_related("items__product").select_related("user").order_by("-creado_en")[:5]
         return Response({
             "counts": counts,
             "last30d": {
-                "revenue": float(revenue or 0),
-                "orders": recent.count(),
-                "items": sum(o.items.count() for o in recent),
+                "revenue": float(stats["revenue"] or 0),
+                "orders": stats["orders"],
+                "items": stats["items"] or 0,
             },
             "lastOrders": [serialize_order(o, request) for o in last_orders],
         })
@@ -557,16 +789,12 @@ class AdminUsersView(APIView):
 
     def get(self, request):
         q = (request.query_params.get("q") or "").strip()
-        page = max(1, int(request.query_params.get("page") or 1))
-        limit = max(1, min(100, int(request.query_params.get("limit") or 20)))
-        qs = User.objects.all().order_by("-date_joined")
+        qs = User.objects.all()
         if q:
             qs = qs.filter(Q(name__icontains=q) | Q(email__icontains=q))
-        total = qs.count()
-        start = (page - 1) * limit
-        items = qs[start:start + limit]
-        data = [serialize_user(u, request) for u in items]
-        return Response({"items": data, "total": total, "page": page, "pages": ceil(total / limit) if total else 1})
+        return Response(paginate(
+            request, qs, ("-date_joined", "-id"), lambda rows: [serialize_user(u, request) for u in rows]
+        ))
 
     def post(self, request):
         name = (request.data.get("name") or "").strip()
@@ -623,16 +851,12 @@ class AdminOrdersView(APIView):
 
     def get(self, request):
         status_filter = request.query_params.get("status")
-        page = max(1, int(request.query_params.get("page") or 1))
-        limit = max(1, min(100, int(request.query_params.get("limit") or 20)))
-        qs = Order.objects.select_related("user").prefetch_related("items__product").order_by("-creado_en")
+        qs = Order.objects.select_related("user").prefetch_related("items__product")
         if status_filter:
             qs = qs.filter(status=status_filter)
-        total = qs.count()
-        start = (page - 1) * limit
-        items = qs[start:start + limit]
-        data = [serialize_order(o, request) for o in items]
-        return Response({"items": data, "total": total, "page": page, "pages": ceil(total / limit) if total else 1})
+        return Response(paginate(
+            request, qs, ("-creado_en", "-id"), lambda rows: [serialize_order(o, request) for o in rows]
+        ))
 
 
 class AdminOrderDetailView(APIView):
@@ -646,38 +870,57 @@ class AdminOrderDetailView(APIView):
         allowed = {"created", "approved", "paid", "shipped", "delivered", "cancelled", "draft"}
         if status_val not in allowed:
             return Response({"error": "Estado invalido"}, status=status.HTTP_400_BAD_REQUEST)
+        previous = order.status
         order.status = status_val
-        # Opcionalmente actualizar items si vienen en el payload
-        raw_items = request.data.get("items")
-        if isinstance(raw_items, list) and raw_items:
+        cancelled = status_val == "cancelled"
+        try:
             with transaction.atomic():
-                order.items.all().delete()
-                built_items = []
-                for raw in raw_items:
-                    pid = raw.get("productId") or raw.get("product") or raw.get("id") or raw.get("slug")
-                    product = resolve_product(pid)
-                    qty = max(1, int(raw.get("qty") or raw.get("cantidad") or 1))
-                    price = raw.get("price")
-                    if price is None and product:
-                        price = product.precio
-                    price = Decimal(str(price or 0))
-                    name = raw.get("name") or (product.nombre if product else "")
-                    if not name or not product:
-                        continue
-                    built_items.append({"product": product, "qty": qty, "price": price})
-                if built_items:
-                    for it in built_items:
-                        OrderItem.objects.create(
-                            order=order,
-                            product=it["product"],
-                            cantidad=it["qty"],
-                            precio_unitario=it["price"],
-                        )
-                    order.recalc_total()
-        order.save()
+                if cancelled and previous != "cancelled":
+                    release_orders([order.pk])
+                    order.stock_reservado = False
+                # Opcionalmente actualizar items si vienen en el payload
+                raw_items = request.data.get("items")
+                replaced = isinstance(raw_items, list) and raw_items and self._replace_items(order, raw_items)
+                if not cancelled and not order.stock_reservado and (replaced or previous == "cancelled"):
+                    # items nuevos o pedido reactivado: se reserva lo que tiene ahora
+                    reserve_order(order)
+                save_order(order)
+        except OutOfStock as exc:
+            return Response({"error": str(exc), "items": exc.as_data()}, status=status.HTTP_409_CONFLICT)
         order.refresh_from_db()
         return Response(serialize_order(order, request))
 
+    def _replace_items(self, order, raw_items):
+        built_items = []
+        for raw in raw_items:
+            pid = raw.get("productId") or raw.get("product") or raw.get("id") or raw.get("slug")
+            product = resolve_product(pid)
+            qty = max(1, int(raw.get("qty") or raw.get("cantidad") or 1))
+            price = raw.get("price")
+            if price is None and product:
+                price = product.precio
+            price = Decimal(str(price or 0))
+            name = raw.get("name") or (product.nombre if product else "")
+            if not name or not product:
+                continue
+            built_items.append({"product": product, "qty": qty, "price": price})
+        if not built_items:
+            return False
+        if order.stock_reservado:
+            # el stock de los items viejos vuelve antes de borrarlos
+            release_orders([order.pk])
+            order.stock_reservado = False
+        order.items.all().delete()
+        for it in built_items:
+            OrderItem.objects.create(
+                order=order,
+                product=it["product"],
+                cantidad=it["qty"],
+                precio_unitario=it["price"],
+            )
+        order.recalc_total()
+        return True
+
 
 class AdminProductsView(APIView):
     permission_classes = [permissions.IsAdminUser]
@@ -685,22 +928,23 @@ class AdminProductsView(APIView):
 
     def get(self, request):
         q = (request.query_params.get("q") or "").strip()
-        page = max(1, int(request.query_params.get("page") or 1))
-        limit = max(1, min(100, int(request.query_params.get("limit") or 20)))
-        qs = Product.objects.select_related("categoria").order_by("-creado_en")
+        qs = Product.objects.select_related("categoria")
+        ordering = PRODUCT_SORTS["newest"]
         if q:
-            qs = qs.filter(Q(nombre__icontains=q) | Q(descripcion__icontains=q))
-        total = qs.count()
-        start = (page - 1) * limit
-        items = qs[start:start + limit]
-        data = [serialize_product(p, request) for p in items]
-        return Response({"items": data, "total": total, "page": page, "pages": ceil(total / limit) if total else 1})
+            qs = search_products(qs, q)
+            ordering = PRODUCT_SORTS["relevance"]
+        return Response(paginate(request, qs, ordering, lambda rows: serialize_products(rows, request)))
 
     def post(self, request):
         name = (request.data.get("name") or "").strip()
         price = request.data.get("price")
         if not name or price is None:
             return Response({"error": "Nombre y precio requeridos"}, status=status.HTTP_400_BAD_REQUEST)
+        if request.FILES.get("image"):
+            try:
+                check_upload(request.FILES["image"])
+            except UploadRejected as exc:
+                return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
         cat_val = request.data.get("category")
         category = resolve_category(cat_val) if cat_val else None
         product = Product(
@@ -740,6 +984,10 @@ class AdminProductDetailView(APIView):
             cat = resolve_category(request.data.get("category"))
             product.categoria = cat
         if request.FILES.get("image"):
+            try:
+                check_upload(request.FILES["image"])
+            except UploadRejected as exc:
+                return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
             product.imagen = request.FILES["image"]
         product.save()
         return Response(serialize_product(product, request))
@@ -760,20 +1008,61 @@ class AdminUploadImageView(APIView):
         file_obj = request.FILES.get("file") or request.FILES.get("image") or request.FILES.get("avatar")
         if not file_obj:
             return Response({"error": "Archivo requerido"}, status=status.HTTP_400_BAD_REQUEST)
-        path = default_storage.save(f"uploads/{file_obj.name}", file_obj)
-        url = _abs_media(request, default_storage.url(path))
-        return Response({"url": url, "path": default_storage.url(path)})
+        storage = Product._meta.get_field("imagen").storage
+        try:
+            check_upload(file_obj)
+            path = storage.save(f"uploads/{file_obj.name}", file_obj)
+        except UploadRejected as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        url = _abs_media(request, storage.url(path))
+        return Response({"url": url, "path": storage.url(path)})
+
+
+class ImageDerivativeView(APIView):
+    """Imagen de un producto redimensionada a un preset (``IMAGE_PRESETS``) en WebP o JPEG."""
+
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, preset, fmt, name):
+        fmt = "jpeg" if fmt == "jpg" else fmt
+        # solo originales públicos: bajo IMAGE_SOURCE_PREFIXES y en uso por algún producto
+        if images.source_path(name) is None or not Product.objects.filter(imagen=name).exists():
+            return Response({"error": "Imagen no encontrada"}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            target, digest = images.ensure_derivative(name, preset, fmt)
+        except (OSError, images.InvalidImage):
+            return Response({"error": "Imagen invalida"}, status=status.HTTP_400_BAD_REQUEST)
+        if target is None:
+            return Response({"error": "Imagen no encontrada"}, status=status.HTTP_404_NOT_FOUND)
+        etag = make_etag(digest, preset, fmt)
+        cached = not_modified(request, etag)
+        if cached:
+            return cached
+        response = FileResponse(open(target, "rb"), content_type=f"image/{fmt}")
+        response["Cache-Control"] = f"public, max-age={getattr(settings, 'IMAGE_CACHE_MAX_AGE', 604800)}"
+        return set_validators(response, etag)
 
 
 class OffersListView(APIView):
     permission_classes = [permissions.AllowAny]
 
+    @cache_catalog_response
     def get(self, request):
-        now = timezone.now()
-        offers = Offer.objects.filter(activo=True).filter(
-            models.Q(empieza__isnull=True) | models.Q(empieza__lte=now),
-            models.Q(termina__isnull=True) | models.Q(termina__gte=now),
-        ).order_by("-porcentaje")
+        etag, last_modified = catalog_validators(request, "offers")
+        cached = not_modified(request, etag, last_modified)
+        if cached:
+            return cached
+        qs = active_offers().select_related("producto__categoria", "categoria")
+        if wants_pagination(request):
+            data = paginate(request, qs, ("-porcentaje", "-id"), lambda rows: self.serialize(rows, request))
+        else:
+            data = {"items": self.serialize(qs.order_by("-porcentaje"), request)}
+        return set_validators(Response(data), etag, last_modified)
+
+    @staticmethod
+    def serialize(offers, request):
+        offers = list(offers)
+        discounts = resolve_discounts([off.producto for off in offers])
         data = []
         for off in offers:
             data.append({
@@ -782,31 +1071,62 @@ class OffersListView(APIView):
                 "name": off.nombre,
                 "description": off.descripcion,
                 "percent": float(off.porcentaje),
-                "product": serialize_product(off.producto, request) if off.producto else None,
+                "product": serialize_product(off.producto, request, discounts=discounts) if off.producto else None,
                 "category": serialize_category(off.categoria),
                 "starts": off.empieza.isoformat() if off.empieza else None,
                 "ends": off.termina.isoformat() if off.termina else None,
             })
-        return Response({"items": data})
+        return data
+
+
+class CatalogSnapshotManifestView(APIView):
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request):
+        manifest = snapshots.read_manifest()
+        if not manifest:
+            return Response({"error": "Snapshot no generado"}, status=status.HTTP_404_NOT_FOUND)
+        response = Response(manifest)
+        response["Cache-Control"] = "no-cache"
+        return response
+
+
+class AdminCacheStatsView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(cache_stats())
+
+    def delete(self, request):
+        reset_cache_stats()
+        return Response({"ok": True})
 
 
 class AdminOffersView(APIView):
     permission_classes = [permissions.IsAdminUser]
 
     def get(self, request):
-        qs = Offer.objects.select_related("producto", "categoria").order_by("-creado_en")
-        data = [{
+        qs = Offer.objects.select_related("producto__categoria", "categoria")
+        if wants_pagination(request):
+            return Response(paginate(request, qs, ("-creado_en", "-id"), lambda rows: self.serialize(rows, request)))
+        data = self.serialize(qs.order_by("-creado_en"), request)
+        return Response({"items": data, "total": len(data)})
+
+    @staticmethod
+    def serialize(offers, request):
+        offers = list(offers)
+        discounts = resolve_discounts([o.producto for o in offers])
+        return [{
             "id": o.id,
             "slug": o.slug,
             "name": o.nombre,
             "percent": float(o.porcentaje),
             "active": o.activo,
-            "product": serialize_product(o.producto, request) if o.producto else None,
+            "product": serialize_product(o.producto, request, discounts=discounts) if o.producto else None,
             "category": serialize_category(o.categoria),
             "starts": o.empieza.isoformat() if o.empieza else None,
             "ends": o.termina.isoformat() if o.termina else None,
-        } for o in qs]
-        return Response({"items": data, "total": len(data)})
+        } for o in offers]
 
     def post(self, request):
         name = (request.data.get("name") or "").strip()
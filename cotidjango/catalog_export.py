@@ -0,0 +1,51 @@
+"""Exportación completa del catálogo en streaming (JSON o NDJSON, opcionalmente gzip)."""
+import json
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+EXPORT_CHUNK_SIZE = 500
+
+
+def iter_chunks(qs, chunk_size=EXPORT_CHUNK_SIZE):
+    """Recorre ``qs`` con un cursor del servidor y entrega listas de ``chunk_size`` filas."""
+    chunk = []
+    for obj in qs.iterator(chunk_size=chunk_size):
+        chunk.append(obj)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _dumps(item):
+    return json.dumps(item, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(",", ":"))
+
+
+def iter_ndjson(chunks, serialize):
+    for chunk in chunks:
+        yield "".join(_dumps(item) + "\n" for item in serialize(chunk)).encode("utf-8")
+
+
+def iter_json_array(chunks, serialize, meta=None):
+    head = "{" + ",".join(f"{_dumps(k)}:{_dumps(v)}" for k, v in (meta or {}).items())
+    yield (head + ("," if meta else "") + '"items":[').encode("utf-8")
+    first = True
+    for chunk in chunks:
+        parts = []
+        for item in serialize(chunk):
+            parts.append(("" if first else ",") + _dumps(item))
+            first = False
+        if parts:
+            yield "".join(parts).encode("utf-8")
+    yield b"]}"
+
+
+def gzip_stream(pieces, level=6):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for piece in pieces:
+        data = compressor.compress(piece)
+        if data:
+            yield data
+    yield compressor.flush()
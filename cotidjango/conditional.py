@@ -0,0 +1,31 @@
+import hashlib
+from calendar import timegm
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+def make_etag(*parts):
+    digest = hashlib.sha1("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+    return f'"{digest}"'
+
+
+def _timestamp(value):
+    return timegm(value.utctimetuple()) if value else None
+
+
+def not_modified(request, etag, last_modified=None):
+    """Devuelve un 304 si el cliente ya tiene la versión actual, o None."""
+    if request.method not in ("GET", "HEAD"):
+        return None
+    response = get_conditional_response(request, etag=etag, last_modified=_timestamp(last_modified))
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag, last_modified=None):
+    response["ETag"] = etag
+    if last_modified:
+        response["Last-Modified"] = http_date(_timestamp(last_modified))
+    return response
@@ -0,0 +1,166 @@
+"""Derivados redimensionados (WebP/JPEG) de las imágenes subidas.
+
+Los derivados se generan la primera vez que se piden y quedan en
+``IMAGE_DERIVATIVES_ROOT/<hash[:2]>/<hash>/<preset>.<formato>``, donde ``hash``
+es el sha256 del archivo original: reemplazar la imagen genera derivados
+nuevos y dos uploads idénticos comparten los mismos.
+"""
+import hashlib
+import os
+import threading
+from pathlib import Path
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.cache import cache
+
+FORMATS = {"webp": "WEBP", "jpeg": "JPEG"}
+SAVE_OPTIONS = {
+    "WEBP": {"quality": 80, "method": 4},
+    "JPEG": {"quality": 82, "optimize": True, "progressive": True},
+}
+
+
+class InvalidImage(ValueError):
+    """Pillow no pudo decodificar el original (formato roto, bomba de descompresión...)."""
+
+
+def presets():
+    return getattr(settings, "IMAGE_PRESETS", {"sm": 200, "md": 400, "lg": 800})
+
+
+def derivatives_root():
+    return Path(getattr(settings, "IMAGE_DERIVATIVES_ROOT", Path(settings.MEDIA_ROOT) / "derivatives"))
+
+
+def source_prefixes():
+    return tuple(getattr(settings, "IMAGE_SOURCE_PREFIXES", ("uploads/", "products/")))
+
+
+def source_path(name):
+    """Ruta absoluta de un original publicable, o ``None``.
+
+    Solo se aceptan archivos de MEDIA_ROOT bajo ``IMAGE_SOURCE_PREFIXES`` (las
+    imágenes de productos), sin componentes ocultos ni ``..``. Que algún
+    producto lo referencie lo verifica quien expone la URL.
+    """
+    name = str(name)
+    parts = name.split("/")
+    if not name.startswith(source_prefixes()) or any(not part or part.startswith(".") for part in parts):
+        return None
+    root = Path(settings.MEDIA_ROOT).resolve()
+    path = (root / name).resolve()
+    if root not in path.parents or derivatives_root().resolve() in path.parents or not path.is_file():
+        return None
+    return path
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def source_hash(path):
+    """sha256 del original, cacheado por (ruta, tamaño, mtime) para no releerlo en cada request."""
+    stat = path.stat()
+    key = f"imghash:{hashlib.sha1(str(path).encode('utf-8')).hexdigest()}:{stat.st_size}:{stat.st_mtime_ns}"
+    digest = cache.get(key)
+    if digest is None:
+        digest = file_hash(path)
+        cache.set(key, digest, None)
+    return digest
+
+
+def derivative_path(digest, preset, fmt, root=None):
+    return Path(root or derivatives_root()) / digest[:2] / digest / f"{preset}.{fmt}"
+
+
+def render_derivative(source, target, width, fmt):
+    """Escala ``source`` a ``width`` px como máximo (sin agrandar) y lo guarda en ``target``.
+
+    Los errores de decodificación de Pillow que no son ``OSError``
+    (``DecompressionBombError``, ``ValueError``/``SyntaxError`` con datos rotos)
+    se levantan como ``InvalidImage``.
+    """
+    from PIL import Image, ImageOps
+
+    target = Path(target)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(f".{target.name}.{os.getpid()}.{threading.get_ident()}")
+    try:
+        with Image.open(source) as image:
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((width, width * 4), Image.Resampling.LANCZOS)
+            pil_format = FORMATS[fmt]
+            if pil_format == "JPEG" and image.mode != "RGB":
+                rgba = image.convert("RGBA")
+                image = Image.new("RGB", rgba.size, (255, 255, 255))
+                image.paste(rgba, mask=rgba.getchannel("A"))
+            elif image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGBA")
+            image.save(tmp, pil_format, **SAVE_OPTIONS[pil_format])
+    except OSError:
+        tmp.unlink(missing_ok=True)
+        raise
+    except Exception as exc:
+        tmp.unlink(missing_ok=True)
+        raise InvalidImage(str(exc)) from exc
+    os.replace(tmp, target)
+    return target
+
+
+def ensure_derivative(name, preset, fmt):
+    """Devuelve ``(ruta, hash)`` del derivado, generándolo si todavía no existe.
+
+    ``name`` tiene que ser una imagen referenciada por un producto; no se verifica acá.
+    """
+    widths = presets()
+    if preset not in widths or fmt not in FORMATS:
+        return None, None
+    source = source_path(name)
+    if source is None:
+        return None, None
+    digest = source_hash(source)
+    target = derivative_path(digest, preset, fmt)
+    if not target.is_file():
+        render_derivative(source, target, widths[preset], fmt)
+    return target, digest
+
+
+def build_all_derivatives(source, root, widths, formats=tuple(FORMATS)):
+    """Genera todos los presets de ``source``; pensado para correr en otro proceso (sin ORM)."""
+    digest = file_hash(source)
+    created = 0
+    for preset, width in widths.items():
+        for fmt in formats:
+            target = derivative_path(digest, preset, fmt, root)
+            if not target.is_file():
+                render_derivative(source, target, width, fmt)
+                created += 1
+    return created
+
+
+def derivative_url(request, name, preset, fmt):
+    path = f"/api/images/{preset}.{fmt}/{quote(str(name))}"
+    return request.build_absolute_uri(path) if request else path
+
+
+def image_set(request, field):
+    """URLs ``srcset`` (JPEG y WebP) para un ImageField; ``None`` si no hay imagen local."""
+    if not field or str(field.name).startswith("http"):
+        return None
+    widths = presets()
+    ordered = sorted(widths.items(), key=lambda item: item[1])
+    default = ordered[len(ordered) // 2][0]
+
+    def srcset(fmt):
+        return ", ".join(f"{derivative_url(request, field.name, p, fmt)} {w}w" for p, w in ordered)
+
+    return {
+        "src": derivative_url(request, field.name, default, "jpeg"),
+        "srcset": srcset("jpeg"),
+        "webpSrcset": srcset("webp"),
+    }
@@ -0,0 +1,51 @@
+import os
+import re
+
+from whitenoise.middleware import WhiteNoiseMiddleware
+from whitenoise.responders import MissingFileError
+
+from .snapshots import snapshot_prefix, snapshot_root
+
+# solo archivos de un snapshot publicado (ni manifest.json ni los .build-* en curso)
+SNAPSHOT_FILE_RE = re.compile(r"^v[0-9a-f]+/[\w./-]+\.json$")
+
+
+class CatalogWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """WhiteNoise que además sirve los snapshots de ``CATALOG_SNAPSHOT_ROOT``.
+
+    Los snapshots se publican mientras el proceso corre, así que no están en el
+    índice que WhiteNoise arma al arrancar: los archivos bajo
+    ``CATALOG_SNAPSHOT_URL`` se buscan en disco en cada pedido. Cada ``v<hash>/``
+    es inmutable (el nombre es el hash del contenido) y va con cache para siempre;
+    las variantes ``.gz`` se negocian igual que en los estáticos.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.snapshot_prefix = snapshot_prefix()
+        self.snapshot_root = os.path.join(os.path.abspath(snapshot_root()), "")
+
+    def __call__(self, request):
+        static_file = self.find_snapshot_file(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return super().__call__(request)
+
+    def find_snapshot_file(self, url):
+        if not url.startswith(self.snapshot_prefix) or not self.url_is_canonical(url):
+            return None
+        relative = url[len(self.snapshot_prefix):]
+        if not SNAPSHOT_FILE_RE.match(relative):
+            return None
+        path = os.path.join(self.snapshot_root, relative)
+        if not os.path.isfile(path):
+            return None
+        try:
+            return self.get_static_file(path, url)
+        except MissingFileError:
+            return None
+
+    def immutable_file_test(self, path, url):
+        if url.startswith(self.snapshot_prefix):
+            return True
+        return super().immutable_file_test(path, url)
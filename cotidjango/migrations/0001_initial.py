@@ -0,0 +1,22 @@
+# Generated by Django 5.2.8 on 2026-10-16 22:38
+
+import cotidjango.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TableVersion',
+            fields=[
+                ('table', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('version', models.BigIntegerField(default=cotidjango.models._seed)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+import time
+
+from django.db import models
+
+
+def _seed():
+    # semilla basada en el reloj: si la tabla se recrea no se reutilizan versiones viejas
+    return time.time_ns()
+
+
+class TableVersion(models.Model):
+    """Contador de versión de una tabla (ver ``cotidjango.versioning``)."""
+
+    table = models.CharField(max_length=100, primary_key=True)
+    version = models.BigIntegerField(default=_seed)
+
+    def __str__(self) -> str:
+        return f"{self.table}@{self.version}"
@@ -0,0 +1,299 @@
+import base64
+import binascii
+import hashlib
+import json
+from functools import partial
+from math import ceil
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import Paginator
+from django.db.models import F, Q
+from django.db.models.sql import Query
+from django.utils.functional import cached_property
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.pagination import PageNumberPagination
+
+from . import versioning
+
+
+class InvalidCursor(APIException):
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_detail = {"error": "Cursor invalido"}
+    default_code = "invalid_cursor"
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, default=str, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token, size):
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, binascii.Error, UnicodeError):
+        raise InvalidCursor()
+    # Solo la última columna (única) no puede ser NULL; las demás sí, p. ej. el
+    # precio efectivo de un producto sin fila materializada.
+    if not isinstance(values, list) or len(values) != size or values[-1] is None:
+        raise InvalidCursor()
+    return values
+
+
+def _sort_field(qs, name):
+    """Campo de modelo (o ``output_field`` de la anotación) detrás de ``name``."""
+    if name in qs.query.annotations:
+        return qs.query.annotations[name].output_field
+    opts = qs.model._meta
+    parts = name.split("__")
+    for part in parts[:-1]:
+        opts = opts.get_field(part).related_model._meta
+    field = opts.get_field(parts[-1])
+    return field.target_field if field.is_relation else field
+
+
+def _nullable(qs, name):
+    """Si la columna de orden ``name`` puede ser NULL (campo nullable o JOIN opcional)."""
+    if name in qs.query.annotations:
+        return qs.query.annotations[name].output_field.null
+    opts = qs.model._meta
+    parts = name.split("__")
+    for part in parts[:-1]:
+        relation = opts.get_field(part)
+        # relación inversa (LEFT JOIN) o FK nullable: la fila relacionada puede faltar
+        if not relation.concrete or relation.null:
+            return True
+        opts = relation.related_model._meta
+    return opts.get_field(parts[-1]).null
+
+
+def cursor_values(qs, ordering, token):
+    """Decodifica ``token`` y convierte cada valor al tipo de su columna de orden."""
+    values = decode_cursor(token, len(ordering))
+    coerced = []
+    for field, value in zip(ordering, values):
+        if value is None:
+            if not _nullable(qs, field.lstrip("-")):
+                raise InvalidCursor()
+            coerced.append(None)
+            continue
+        if isinstance(value, (list, dict)):
+            raise InvalidCursor()
+        try:
+            coerced.append(_sort_field(qs, field.lstrip("-")).to_python(value))
+        except (FieldDoesNotExist, ValidationError, TypeError, ValueError, ArithmeticError):
+            raise InvalidCursor()
+    return coerced
+
+
+def _field_value(obj, field):
+    value = obj
+    for part in field.lstrip("-").split("__"):
+        value = getattr(value, part, None)
+        if value is None:
+            return None
+    if hasattr(value, "pk") and not isinstance(value, (int, float, str)):
+        return value.pk
+    return value
+
+
+def cursor_for(obj, ordering):
+    return encode_cursor([_field_value(obj, field) for field in ordering])
+
+
+def keyset_order_by(qs, ordering):
+    """``ordering`` con los NULL al final en las columnas que pueden tenerlos.
+
+    Las columnas NOT NULL quedan como ``order_by`` simple para que SQLite use el
+    índice ``(campo, id)`` sin ordenar en un B-tree temporal.
+    """
+    order = []
+    for field in ordering:
+        name = field.lstrip("-")
+        if not _nullable(qs, name):
+            order.append(field)
+        elif field.startswith("-"):
+            order.append(F(name).desc(nulls_last=True))
+        else:
+            order.append(F(name).asc(nulls_last=True))
+    return order
+
+
+def keyset_filter(qs, ordering, values):
+    """Filas estrictamente posteriores a ``values`` según ``ordering`` (sin OFFSET).
+
+    Para columnas NOT NULL es ``campo <= v AND (campo < v OR (campo = v AND id < w))``,
+    que SQLite resuelve con un SEARCH sobre el índice ``(campo, id)``. Las nullable
+    siguen el orden de ``keyset_order_by``: un valor no nulo va antes que cualquier NULL, y detrás
+    de un NULL solo pueden seguir otros NULL en esa columna.
+    """
+    condition = Q()
+    equal = Q()
+    for field, value in zip(ordering, values):
+        name = field.lstrip("-")
+        if value is None:
+            equal &= Q(**{f"{name}__isnull": True})
+            continue
+        op = "lt" if field.startswith("-") else "gt"
+        after = Q(**{f"{name}__{op}": value})
+        if _nullable(qs, name):
+            after |= Q(**{f"{name}__isnull": True})
+        condition |= equal & after
+        equal &= Q(**{name: value})
+    first, value = ordering[0], values[0]
+    if value is not None and not _nullable(qs, first.lstrip("-")):
+        # cota redundante sobre la primera columna: le da a SQLite un rango para el índice
+        op = "lte" if first.startswith("-") else "gte"
+        condition &= Q(**{f"{first.lstrip('-')}__{op}": value})
+    return qs.filter(condition)
+
+
+def _count_cache():
+    return caches[getattr(settings, "COUNT_CACHE_ALIAS", "default")]
+
+
+def _query_tables(query):
+    """Tablas que lee ``query``, incluidas las de subconsultas (``Exists``, ``__in``...)."""
+    tables = {query.model._meta.db_table}
+    tables.update(join.table_name for join in query.alias_map.values())
+    pending = [query.where, *query.annotations.values()]
+    while pending:
+        node = pending.pop()
+        if isinstance(node, Query):
+            tables |= _query_tables(node)
+        elif hasattr(node, "get_source_expressions"):
+            pending.extend(expr for expr in node.get_source_expressions() if expr is not None)
+    return tables
+
+
+def count_signature(qs):
+    """Clave del COUNT: SQL normalizado + versión de cada tabla involucrada."""
+    query = qs.order_by().query
+    tables = _query_tables(query)
+    sql, params = query.sql_with_params()
+    digest = hashlib.sha1(f"{sql}|{params!r}".encode("utf-8")).hexdigest()
+    return f"count:{digest}:{versioning.table_versions(tables)}"
+
+
+def cached_count(qs, estimated=False):
+    """Devuelve ``(total, es_estimado)``.
+
+    El conteo exacto se cachea por firma de filtros hasta que cambie alguna de
+    las tablas. En modo estimado cuenta como mucho ``COUNT_ESTIMATE_LIMIT`` filas
+    (``SELECT COUNT(*) FROM (... LIMIT n)``) y marca si hay más.
+    """
+    cache = _count_cache()
+    timeout = getattr(settings, "COUNT_CACHE_TIMEOUT", 300)
+    key = count_signature(qs)
+    total = cache.get(key)
+    if total is not None:
+        return total, False
+    if estimated:
+        cap = getattr(settings, "COUNT_ESTIMATE_LIMIT", 1000)
+        estimate_key = f"{key}:est{cap}"
+        bounded = cache.get(estimate_key)
+        if bounded is None:
+            bounded = qs.order_by()[:cap + 1].count()
+            cache.set(estimate_key, bounded, timeout)
+        if bounded > cap:
+            return cap, True
+        cache.set(key, bounded, timeout)
+        return bounded, False
+    total = qs.count()
+    cache.set(key, total, timeout)
+    return total, False
+
+
+def wants_estimated_count(request):
+    return (request.query_params.get("count") or "").lower() in {"estimated", "estimate", "approx"}
+
+
+def parse_limit(params, default=20, maximum=100):
+    try:
+        return max(1, min(maximum, int(params.get("limit") or default)))
+    except (TypeError, ValueError):
+        return default
+
+
+def paginate(request, qs, ordering, serialize, default_limit=20, max_limit=100):
+    """Pagina ``qs`` con el formato del bridge.
+
+    Con ``?cursor=`` (vacío para la primera página) usa keyset sobre ``ordering``:
+    costo acotado, sin COUNT ni OFFSET. Sin cursor mantiene ``page``/``pages``/``total``
+    (conteo cacheado; ``?count=estimated`` lo acota) y agrega ``nextCursor`` para
+    poder pasar al modo keyset desde cualquier página.
+    ``ordering`` debe terminar en una columna única (ej. ``-id``).
+    """
+    params = request.query_params
+    limit = parse_limit(params, default_limit, max_limit)
+    qs = qs.order_by(*keyset_order_by(qs, ordering))
+    cursor = params.get("cursor")
+
+    if cursor is not None:
+        if cursor:
+            qs = keyset_filter(qs, ordering, cursor_values(qs, ordering, cursor))
+        rows = list(qs[:limit + 1])
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        return {
+            "items": serialize(rows),
+            "limit": limit,
+            "hasMore": has_more,
+            "nextCursor": cursor_for(rows[-1], ordering) if has_more else None,
+        }
+
+    try:
+        page = max(1, int(params.get("page") or 1))
+    except (TypeError, ValueError):
+        page = 1
+    total, estimated = cached_count(qs, estimated=wants_estimated_count(request))
+    start = (page - 1) * limit
+    rows = list(qs[start:start + limit])
+    has_more = len(rows) == limit and (estimated or start + len(rows) < total)
+    data = {
+        "items": serialize(rows),
+        "total": total,
+        "page": page,
+        "pages": ceil(total / limit) if total else 1,
+        "nextCursor": cursor_for(rows[-1], ordering) if rows and has_more else None,
+    }
+    if estimated:
+        data["totalEstimated"] = True
+        data["totalLabel"] = f"{total}+"
+    return data
+
+
+def wants_pagination(request):
+    params = request.query_params
+    return any(key in params for key in ("cursor", "page", "limit"))
+
+
+class CachedCountPaginator(Paginator):
+    def __init__(self, *args, estimated=False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.estimated = estimated
+
+    @cached_property
+    def count(self):
+        if not hasattr(self.object_list, "query"):
+            self.estimated = False
+            return len(self.object_list)
+        total, self.estimated = cached_count(self.object_list, estimated=self.estimated)
+        return total
+
+
+class CachedCountPageNumberPagination(PageNumberPagination):
+    """``PageNumberPagination`` con COUNT cacheado y modo ``?count=estimated``."""
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.django_paginator_class = partial(CachedCountPaginator, estimated=wants_estimated_count(request))
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        if self.page.paginator.estimated:
+            response.data["countEstimated"] = True
+        return response
@@ -0,0 +1,122 @@
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Min, Q
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from rest_framework.response import Response
+
+STATS_KEYS = ("hits", "misses")
+VALIDATOR_HEADERS = ("ETag", "Last-Modified")
+
+
+def _cache():
+    return caches[getattr(settings, "CATALOG_CACHE_ALIAS", "default")]
+
+
+def _timeout():
+    return getattr(settings, "CATALOG_CACHE_TIMEOUT", 600)
+
+
+def _incr(name):
+    cache = _cache()
+    key = f"catalog-cache:stats:{name}"
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, None)
+        try:
+            cache.incr(key)
+        except ValueError:
+            pass
+
+
+def cache_stats():
+    cache = _cache()
+    values = {name: cache.get(f"catalog-cache:stats:{name}") or 0 for name in STATS_KEYS}
+    total = values["hits"] + values["misses"]
+    values["hitRatio"] = round(values["hits"] / total, 4) if total else None
+    values["alias"] = getattr(settings, "CATALOG_CACHE_ALIAS", "default")
+    values["backend"] = settings.CACHES.get(values["alias"], {}).get("BACKEND")
+    return values
+
+
+def reset_cache_stats():
+    _cache().delete_many([f"catalog-cache:stats:{name}" for name in STATS_KEYS])
+
+
+def _seconds_to_next_offer_boundary(version):
+    """Las ofertas entran/salen de vigencia sin escrituras: el TTL no puede pasar ese momento."""
+    from products.models import Offer
+
+    cache = _cache()
+    now = timezone.now()
+    key = f"catalog-cache:boundary:{version}"
+    boundary = cache.get(key)
+    if boundary is None or (boundary and boundary <= now):
+        agg = Offer.objects.filter(activo=True).aggregate(
+            start=Min("empieza", filter=Q(empieza__gt=now)),
+            end=Min("termina", filter=Q(termina__gte=now)),
+        )
+        moments = [m for m in (agg["start"], agg["end"]) if m]
+        boundary = min(moments) if moments else False
+        cache.set(key, boundary, _timeout())
+    if not boundary:
+        return None
+    return max(1, int((boundary - now).total_seconds()) + 1)
+
+
+def response_cache_key(request, version):
+    params = sorted((k, v) for k in request.query_params for v in request.query_params.getlist(k))
+    raw = f"{request.scheme}://{request.get_host()}{request.path}|{params!r}|{version}"
+    return f"catalog-cache:resp:{hashlib.sha1(raw.encode('utf-8')).hexdigest()}"
+
+
+def cache_catalog_response(view_method):
+    """Cachea el GET anónimo de un endpoint de catálogo.
+
+    La clave incluye path, query normalizada y ``catalog_version()``: cualquier
+    alta/baja/edición de Product, Offer o Category, hecha desde cualquier proceso,
+    cambia la versión (compartida en la base) y deja las entradas viejas
+    inalcanzables (expiran solas). Los usuarios autenticados
+    siempre van a la base.
+    """
+
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        if request.method != "GET" or request.user.is_authenticated:
+            return view_method(self, request, *args, **kwargs)
+        from products.catalog import catalog_version
+
+        version = catalog_version()
+        key = response_cache_key(request, version)
+        cache = _cache()
+        entry = cache.get(key)
+        if entry is not None:
+            _incr("hits")
+            headers = entry["headers"]
+            if "ETag" in headers:
+                not_modified = get_conditional_response(request, etag=headers["ETag"])
+                if not_modified is not None:
+                    for name, value in headers.items():
+                        not_modified[name] = value
+                    return not_modified
+            response = Response(entry["data"], status=entry["status"])
+            for name, value in headers.items():
+                response[name] = value
+            return response
+
+        _incr("misses")
+        response = view_method(self, request, *args, **kwargs)
+        if response.status_code == 200 and getattr(response, "data", None) is not None:
+            timeout = _timeout()
+            until_boundary = _seconds_to_next_offer_boundary(version)
+            if until_boundary is not None:
+                timeout = min(timeout, until_boundary)
+            headers = {name: response[name] for name in VALIDATOR_HEADERS if response.has_header(name)}
+            cache.set(key, {"data": response.data, "status": response.status_code, "headers": headers}, timeout)
+        return response
+
+    return wrapper
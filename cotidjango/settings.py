@@ -54,6 +54,7 @@ INSTALLED_APPS = [
     'rest_framework.authtoken',
     'corsheaders',
     # Local apps
+    'cotidjango',
     'users',
     'products',
     'scraping',
@@ -62,7 +63,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'cotidjango.middleware.CatalogWhiteNoiseMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -99,6 +100,10 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # escrituras concurrentes (reserva de stock): esperar el lock en vez de fallar con "database is locked"
+        'OPTIONS': {'transaction_mode': 'IMMEDIATE', 'timeout': 20},
+        # base de tests en archivo para que los tests de concurrencia puedan abrir varias conexiones
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
@@ -144,6 +149,29 @@ STATICFILES_DIRS = [BASE_DIR / 'static']
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Imagenes de productos direccionadas por contenido (uploads/ab/cd/<sha256>.<ext>), ver Product.imagen
+MEDIA_UPLOAD_MAX_BYTES = int(os.getenv("MEDIA_UPLOAD_MAX_BYTES", str(10 * 1024 * 1024)))
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage"},
+}
+
+# Descarga de imagenes del import XLSX: hilos y cache por URL (ETag/Last-Modified)
+IMPORT_IMAGE_WORKERS = int(os.getenv("IMPORT_IMAGE_WORKERS", "8"))
+IMPORT_IMAGE_CACHE_DIR = Path(os.getenv("IMPORT_IMAGE_CACHE_DIR", str(BASE_DIR / '.cache' / 'import-images')))
+
+# Imports XLSX en segundo plano (manage.py process_import_jobs); los archivos no son publicos
+IMPORT_JOBS_ROOT = Path(os.getenv("IMPORT_JOBS_ROOT", str(BASE_DIR / 'private' / 'imports')))
+IMPORT_JOB_STALE_SECONDS = int(os.getenv("IMPORT_JOB_STALE_SECONDS", "300"))
+IMPORT_JOB_MAX_ATTEMPTS = int(os.getenv("IMPORT_JOB_MAX_ATTEMPTS", "3"))
+
+# Derivados redimensionados de imagenes (ancho maximo por preset, /api/images/<preset>.<webp|jpeg>/<archivo>)
+IMAGE_PRESETS = {"sm": 200, "md": 400, "lg": 800}
+IMAGE_DERIVATIVES_ROOT = MEDIA_ROOT / 'derivatives'
+# unicos directorios de media que se pueden redimensionar (imagenes de productos)
+IMAGE_SOURCE_PREFIXES = ("uploads/", "products/")
+IMAGE_CACHE_MAX_AGE = int(os.getenv("IMAGE_CACHE_MAX_AGE", str(7 * 24 * 3600)))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -187,13 +215,60 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ),
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'cotidjango.pagination.CachedCountPageNumberPagination',
     'PAGE_SIZE': 20,
 }
 
+# Cache por defecto en memoria del proceso. Las versiones de tabla que invalidan
+# los caches derivados viven en la base (cotidjango.TableVersion), compartidas por
+# todos los procesos; con varios workers conviene además un backend compartido
+# (ej. CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache) para no
+# repetir el trabajo en cada uno.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        'LOCATION': os.getenv("CACHE_LOCATION", "cotidjango"),
+    }
+}
+
+# Cache de respuestas anonimas del catalogo (productos, ofertas, categorias).
+# CATALOG_CACHE_BACKEND: "locmem", "file" o el nombre de cualquier alias de CACHES.
+CATALOG_CACHE_BACKEND = os.getenv("CATALOG_CACHE_BACKEND", "locmem")
+if CATALOG_CACHE_BACKEND == "locmem":
+    CACHES['catalog'] = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'catalog',
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    }
+elif CATALOG_CACHE_BACKEND == "file":
+    CACHES['catalog'] = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv("CATALOG_CACHE_LOCATION", str(BASE_DIR / '.cache' / 'catalog')),
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    }
+CATALOG_CACHE_ALIAS = 'catalog' if CATALOG_CACHE_BACKEND in {"locmem", "file"} else CATALOG_CACHE_BACKEND
+CATALOG_CACHE_TIMEOUT = int(os.getenv("CATALOG_CACHE_TIMEOUT", "600"))
+
+# COUNT(*) de listados paginados: cacheados por firma de filtros + version de tabla
+COUNT_CACHE_TIMEOUT = int(os.getenv("COUNT_CACHE_TIMEOUT", "300"))
+COUNT_ESTIMATE_LIMIT = int(os.getenv("COUNT_ESTIMATE_LIMIT", "1000"))
+
+# Cortes de los rangos de precio en ?facets=1 de /api/products
+FACET_PRICE_BUCKETS = [
+    int(edge) for edge in os.getenv("FACET_PRICE_BUCKETS", "1000,2500,5000,10000").split(",") if edge.strip()
+]
+
+# Snapshots estaticos del catalogo (python manage.py build_catalog_snapshot [--watch]):
+# se escriben en CATALOG_SNAPSHOT_ROOT y WhiteNoise (o el servidor web del frente)
+# los sirve bajo CATALOG_SNAPSHOT_URL
+CATALOG_SNAPSHOT_ROOT = Path(os.getenv("CATALOG_SNAPSHOT_ROOT", str(BASE_DIR / 'private' / 'catalog')))
+CATALOG_SNAPSHOT_URL = os.getenv("CATALOG_SNAPSHOT_URL", "/api/catalog/snapshot/")
+CATALOG_SNAPSHOT_BASE_URL = os.getenv("CATALOG_SNAPSHOT_BASE_URL", "")
+CATALOG_SNAPSHOT_PAGES = int(os.getenv("CATALOG_SNAPSHOT_PAGES", "3"))
+CATALOG_SNAPSHOT_PAGE_SIZE = int(os.getenv("CATALOG_SNAPSHOT_PAGE_SIZE", "20"))
+CATALOG_SNAPSHOT_KEEP = int(os.getenv("CATALOG_SNAPSHOT_KEEP", "2"))
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=4),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
 }
-
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
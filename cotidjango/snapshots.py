@@ -0,0 +1,174 @@
+"""Snapshots estáticos del catálogo (JSON + .gz) prerenderizados.
+
+Cada snapshot vive en ``<CATALOG_SNAPSHOT_ROOT>/v<id>/`` y nunca se modifica;
+WhiteNoise (``cotidjango.middleware.CatalogWhiteNoiseMiddleware``) o el
+servidor web del frente los sirven bajo ``CATALOG_SNAPSHOT_URL`` con cache
+"immutable". ``manifest.json`` apunta al vigente y es lo único que el frontend
+tiene que revalidar. Se generan con ``build_catalog_snapshot`` (``--watch``
+para regenerar tras cada cambio del catálogo), nunca dentro de los workers web.
+"""
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpRequest, QueryDict
+from django.utils import timezone
+
+MANIFEST_NAME = "manifest.json"
+
+
+def snapshot_root():
+    return Path(getattr(settings, "CATALOG_SNAPSHOT_ROOT", Path(settings.BASE_DIR) / "private" / "catalog"))
+
+
+def snapshot_prefix():
+    """Prefijo de URL bajo el que se publica ``snapshot_root()``."""
+    prefix = getattr(settings, "CATALOG_SNAPSHOT_URL", "/api/catalog/snapshot/").strip("/")
+    return f"/{prefix}/" if prefix else "/"
+
+
+def snapshot_url(version):
+    """URL base del snapshot ``version``."""
+    return f"{snapshot_prefix()}v{version}/"
+
+
+def read_manifest():
+    try:
+        with open(snapshot_root() / MANIFEST_NAME, encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def _request(path, params=None):
+    """Request GET anónima para renderizar las vistas del bridge fuera de un request real."""
+    base = urlsplit(getattr(settings, "CATALOG_SNAPSHOT_BASE_URL", "") or "http://localhost")
+    request = HttpRequest()
+    request.method = "GET"
+    request.path = request.path_info = path
+    request.GET = QueryDict(mutable=True)
+    request.GET.update(params or {})
+    request.META.update({
+        "SERVER_NAME": base.hostname or "localhost",
+        "SERVER_PORT": str(base.port or (443 if base.scheme == "https" else 80)),
+        "HTTP_HOST": base.netloc or "localhost",
+        "QUERY_STRING": request.GET.urlencode(),
+        "wsgi.url_scheme": base.scheme or "http",
+    })
+    if base.scheme == "https":
+        request.META["HTTPS"] = "on"
+    return request
+
+
+def _render(view, path, params=None):
+    response = view(_request(path, params))
+    if response.status_code != 200:
+        raise RuntimeError(f"{path} {params or ''} respondió {response.status_code}")
+    return response.data
+
+
+def _write(directory, name, data, digest):
+    target = directory / name
+    target.parent.mkdir(parents=True, exist_ok=True)
+    raw = json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    target.write_bytes(raw)
+    digest.update(name.encode("utf-8"))
+    digest.update(raw)
+    # mtime fijo: el .gz es reproducible y WhiteNoise lo sirve tal cual
+    with open(f"{target}.gz", "wb") as fh, gzip.GzipFile(fileobj=fh, mode="wb", compresslevel=9, mtime=0) as gz:
+        gz.write(raw)
+    return name
+
+
+def _pages(directory, digest, prefix, view, params, max_pages, page_size):
+    files = []
+    for page in range(1, max_pages + 1):
+        data = _render(view, "/api/products", {**params, "page": str(page), "limit": str(page_size)})
+        files.append(_write(directory, f"{prefix}/page-{page}.json", data, digest))
+        if page >= data.get("pages", 1):
+            break
+    return files
+
+
+def build_snapshot():
+    """Renderiza los listados comunes y publica un snapshot si el contenido cambió.
+
+    El id del snapshot es el hash del contenido: varios procesos (o varias
+    corridas sin cambios) producen el mismo directorio. Devuelve el manifest.
+    """
+    from products.categories import category_tree
+    from products.models import Category
+    from products.pricing import refresh_stale_prices
+
+    from . import api_bridge
+
+    refresh_stale_prices()
+    pages = getattr(settings, "CATALOG_SNAPSHOT_PAGES", 3)
+    page_size = getattr(settings, "CATALOG_SNAPSHOT_PAGE_SIZE", 20)
+    products_view = api_bridge.ProductListView.as_view()
+    offers_view = api_bridge.OffersListView.as_view()
+
+    root = snapshot_root()
+    work_dir = root / f".build-{os.getpid()}-{threading.get_ident()}"
+    shutil.rmtree(work_dir, ignore_errors=True)
+    work_dir.mkdir(parents=True)
+    digest = hashlib.sha1()
+    try:
+        files = {
+            "products": _pages(work_dir, digest, "products", products_view, {}, pages, page_size),
+            "categories": {},
+            "offers": _write(work_dir, "offers.json", _render(offers_view, "/api/offers"), digest),
+            "tree": _write(work_dir, "categories/tree.json", category_tree(), digest),
+        }
+        for slug in Category.objects.order_by("slug").values_list("slug", flat=True):
+            files["categories"][slug] = _pages(
+                work_dir, digest, f"categories/{slug}", products_view, {"category": slug}, pages, page_size
+            )
+        version = digest.hexdigest()[:12]
+        final_dir = root / f"v{version}"
+        try:
+            os.replace(work_dir, final_dir)
+        except OSError:
+            # otro proceso ya publicó el mismo contenido
+            if not final_dir.is_dir():
+                raise
+            shutil.rmtree(work_dir)
+    except Exception:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        raise
+
+    manifest = read_manifest()
+    if manifest and manifest.get("version") == version:
+        return manifest
+    manifest = {
+        "version": version,
+        "generatedAt": timezone.now().isoformat(),
+        "baseUrl": snapshot_url(version),
+        "pageSize": page_size,
+        "files": files,
+    }
+    tmp = root / f".{MANIFEST_NAME}.{os.getpid()}.tmp"
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp, root / MANIFEST_NAME)
+    os.utime(final_dir)
+    prune_snapshots(keep=getattr(settings, "CATALOG_SNAPSHOT_KEEP", 2))
+    return manifest
+
+
+def prune_snapshots(keep=2):
+    """Borra los snapshots viejos dejando ``keep`` (el vigente incluido) para clientes con el manifest anterior."""
+    root = snapshot_root()
+    dirs = sorted(
+        (p for p in root.glob("v*") if p.is_dir()),
+        key=lambda p: p.stat().st_mtime,
+        reverse=True,
+    )
+    for old in dirs[max(1, keep):]:
+        shutil.rmtree(old, ignore_errors=True)
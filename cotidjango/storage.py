@@ -0,0 +1,132 @@
+"""Storage de media direccionado por contenido.
+
+Cada archivo subido se escribe en streaming a un temporal mientras se calcula
+su sha256 y se guarda como ``uploads/ab/cd/<sha256>.<ext>``: dos uploads
+iguales comparten el mismo archivo y la URL de un contenido nunca cambia.
+Los blobs pueden estar referenciados por varios registros, así que ``delete``
+no los borra: los que ya nadie usa los limpia ``manage.py prune_media_blobs``.
+"""
+import hashlib
+import os
+import re
+import tempfile
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.storage import FileSystemStorage
+
+CONTENT_PREFIX = "uploads"
+CONTENT_NAME_RE = re.compile(rf"^{CONTENT_PREFIX}/[0-9a-f]{{2}}/[0-9a-f]{{2}}/[0-9a-f]{{64}}\.\w+$")
+
+# firmas de los formatos aceptados (primeros bytes del archivo)
+SIGNATURES = (
+    (b"\xff\xd8\xff", "jpg"),
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+)
+
+
+class UploadRejected(ValueError):
+    pass
+
+
+def max_upload_size():
+    return getattr(settings, "MEDIA_UPLOAD_MAX_BYTES", 10 * 1024 * 1024)
+
+
+def _too_big():
+    return UploadRejected(f"El archivo supera el maximo de {max_upload_size() / (1024 * 1024):.1f} MB")
+
+
+def _not_image():
+    return UploadRejected("El archivo no es una imagen valida (jpg, png, gif, webp o avif)")
+
+
+def sniff_image_type(head):
+    """Extensión según los magic bytes, o ``None`` si no es una imagen aceptada."""
+    for signature, ext in SIGNATURES:
+        if head.startswith(signature):
+            return ext
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    if head[4:12] in (b"ftypavif", b"ftypavis"):
+        return "avif"
+    return None
+
+
+def check_upload(file_obj):
+    """Rechaza antes de escribir nada los archivos muy grandes o que no son imágenes."""
+    size = getattr(file_obj, "size", None)
+    if size is not None and size > max_upload_size():
+        raise _too_big()
+    file_obj.seek(0)
+    head = file_obj.read(16)
+    file_obj.seek(0)
+    if sniff_image_type(head) is None:
+        raise _not_image()
+
+
+def validate_upload(value):
+    """Validador de campo con ``check_upload``: forms y serializers responden 400
+    en lugar de que el storage rechace el archivo dentro de ``save()``."""
+    # los archivos ya guardados no se releen
+    if not value or getattr(value, "_committed", False):
+        return
+    try:
+        check_upload(value)
+    except UploadRejected as exc:
+        raise ValidationError(str(exc), code="invalid_upload") from exc
+
+
+def is_content_addressed(name):
+    return bool(CONTENT_NAME_RE.match(str(name).replace("\\", "/")))
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def _save(self, name, content):
+        limit = max_upload_size()
+        incoming = os.path.join(self.location, ".incoming")
+        os.makedirs(incoming, exist_ok=True)
+        digest = hashlib.sha256()
+        ext = None
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=incoming)
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                if hasattr(content, "seek"):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    if ext is None:
+                        ext = sniff_image_type(chunk[:16])
+                        if ext is None:
+                            raise _not_image()
+                    size += len(chunk)
+                    if size > limit:
+                        raise _too_big()
+                    digest.update(chunk)
+                    tmp.write(chunk)
+            if ext is None:
+                raise UploadRejected("Archivo vacio")
+            hexdigest = digest.hexdigest()
+            final_name = f"{CONTENT_PREFIX}/{hexdigest[:2]}/{hexdigest[2:4]}/{hexdigest}.{ext}"
+            final_path = self.path(final_name)
+            if os.path.exists(final_path):
+                os.unlink(tmp_path)
+                # blob reutilizado: queda "nuevo" para el período de gracia de prune_media_blobs
+                os.utime(final_path)
+            else:
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(tmp_path, self.file_permissions_mode)
+                os.replace(tmp_path, final_path)
+            return final_name
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def delete(self, name):
+        if is_content_addressed(name):
+            return
+        super().delete(name)
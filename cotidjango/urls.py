@@ -38,6 +38,8 @@ urlpatterns = [
     path("mis-ordenes/", MyOrdersView.as_view(), name="orders-mine"),
     path("productos/nuevo/", ProductCreateView.as_view(), name="product-new"),
     path("api/", include("users.urls")),
+    # antes del router DRF: si no, ``products/<pk>/`` captura "batch" como pk
+    re_path(r"^api/products/batch/?$", api_bridge.ProductBatchView.as_view(), name="api-bridge-products-batch"),
     path("api/", include("products.urls")),
     path("api/", include("orders.urls")),
     path("api/scraping/", include("scraping.urls")),
@@ -67,9 +69,21 @@ urlpatterns += [
     re_path(r"^api/admin/products/?$", api_bridge.AdminProductsView.as_view(), name="api-bridge-admin-products"),
     re_path(r"^api/admin/products/(?P<pk>[^/]+)/?$", api_bridge.AdminProductDetailView.as_view(), name="api-bridge-admin-product"),
     re_path(r"^api/admin/upload-image/?$", api_bridge.AdminUploadImageView.as_view(), name="api-bridge-admin-upload"),
+    re_path(
+        r"^api/catalog/export(?:\.(?P<fmt>json|ndjson))?(?P<gz>\.gz)?/?$",
+        api_bridge.ProductExportView.as_view(),
+        name="api-bridge-catalog-export",
+    ),
+    re_path(r"^api/catalog/manifest/?$", api_bridge.CatalogSnapshotManifestView.as_view(), name="api-bridge-catalog-manifest"),
+    re_path(
+        r"^api/images/(?P<preset>\w+)\.(?P<fmt>webp|jpeg|jpg)/(?P<name>.+)$",
+        api_bridge.ImageDerivativeView.as_view(),
+        name="api-bridge-image",
+    ),
     re_path(r"^api/offers/?$", api_bridge.OffersListView.as_view(), name="api-bridge-offers"),
     re_path(r"^api/admin/offers/?$", api_bridge.AdminOffersView.as_view(), name="api-bridge-admin-offers"),
     re_path(r"^api/admin/offers/(?P<pk>[^/]+)/?$", api_bridge.AdminOfferDetailView.as_view(), name="api-bridge-admin-offer"),
+    re_path(r"^api/admin/cache-stats/?$", api_bridge.AdminCacheStatsView.as_view(), name="api-bridge-admin-cache-stats"),
 ]
 
 if settings.DEBUG:
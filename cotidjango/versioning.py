@@ -0,0 +1,66 @@
+"""Contadores de versión por tabla para invalidar caches derivados.
+
+Los contadores viven en la base (``TableVersion``), no en el cache: así los ve
+cualquier proceso (otros workers, ``process_import_jobs``, ``refresh_prices
+--watch``). Cada escritura vía ORM (save/delete) incrementa la versión de la
+tabla del modelo; los caches arman sus claves con esas versiones, así que nunca
+hace falta borrarlos explícitamente. Las escrituras masivas
+(``queryset.update``, ``bulk_create``) tienen que llamar a ``bump`` a mano.
+
+Dentro de una transacción el incremento se difiere al commit: si se hiciera
+antes, un lector concurrente podría cachear las filas viejas bajo la versión
+nueva y esa entrada quedaría vigente hasta la próxima escritura.
+"""
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+
+
+def _table(model_or_table):
+    if isinstance(model_or_table, str):
+        return model_or_table
+    return model_or_table._meta.db_table
+
+
+def _versions(tables):
+    from .models import TableVersion
+
+    return dict(TableVersion.objects.filter(table__in=tables).values_list("table", "version"))
+
+
+def table_version(model_or_table):
+    table = _table(model_or_table)
+    return _versions([table]).get(table, 0)
+
+
+def table_versions(tables):
+    names = sorted({_table(t) for t in tables})
+    versions = _versions(names)
+    return ".".join(f"{versions.get(name, 0)}" for name in names)
+
+
+def _incr(tables):
+    from .models import TableVersion
+
+    for table in tables:
+        if not TableVersion.objects.filter(table=table).update(version=F("version") + 1):
+            # primera escritura de la tabla: la fila nace con una semilla de reloj
+            _, created = TableVersion.objects.get_or_create(table=table)
+            if not created:
+                TableVersion.objects.filter(table=table).update(version=F("version") + 1)
+
+
+def bump(*models_or_tables):
+    tables = [_table(item) for item in models_or_tables]
+    transaction.on_commit(lambda: _incr(tables))
+
+
+def _on_change(sender, raw=False, **kwargs):
+    if not raw:
+        bump(sender)
+
+
+def track(*models):
+    for model in models:
+        post_save.connect(_on_change, sender=model, dispatch_uid=f"versioning-save-{_table(model)}")
+        post_delete.connect(_on_change, sender=model, dispatch_uid=f"versioning-delete-{_table(model)}")
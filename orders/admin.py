@@ -1,6 +1,12 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.db import transaction
+from django.http import HttpResponseRedirect
+from django.utils import timezone
+
+from cotidjango import versioning
 
 from .models import Order, OrderItem
+from .stock import OutOfStock, release_orders, reserve_order, save_order
 
 
 class OrderItemInline(admin.TabularInline):
@@ -11,21 +17,64 @@ class OrderItemInline(admin.TabularInline):
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
-    list_display = ("id", "nombre", "email", "status", "total", "creado_en")
+    list_display = ("id", "nombre", "email", "status", "item_count", "total", "creado_en")
     list_filter = ("status", "creado_en")
     search_fields = ("nombre", "email", "status")
     inlines = [OrderItemInline]
-    readonly_fields = ("total",)
+    readonly_fields = ("total", "item_count")
     actions = ["aprobar", "marcar_pagado", "cancelar"]
 
+    def set_status(self, request, queryset, status):
+        """Cambia el estado en bloque; los pedidos cancelados que se reactivan vuelven a reservar stock."""
+        try:
+            with transaction.atomic():
+                for order in queryset.filter(status="cancelled", stock_reservado=False):
+                    reserve_order(order)
+                queryset.update(status=status, actualizado_en=timezone.now())
+        except OutOfStock as exc:
+            self.message_user(request, str(exc), messages.ERROR)
+            return
+        versioning.bump(Order)
+
     @admin.action(description="Aprobar pedidos seleccionados")
     def aprobar(self, request, queryset):
-        queryset.update(status="approved")
+        self.set_status(request, queryset, "approved")
 
     @admin.action(description="Marcar como pagado")
     def marcar_pagado(self, request, queryset):
-        queryset.update(status="paid")
+        self.set_status(request, queryset, "paid")
 
     @admin.action(description="Cancelar pedidos")
     def cancelar(self, request, queryset):
-        queryset.update(status="cancelled")
+        with transaction.atomic():
+            release_orders(list(queryset.values_list("pk", flat=True)))
+            queryset.update(status="cancelled", actualizado_en=timezone.now())
+        versioning.bump(Order)
+
+    def changeform_view(self, request, object_id=None, form_url="", extra_context=None):
+        # el alta/edición corre en una transacción: si falta stock se revierte completa
+        try:
+            return super().changeform_view(request, object_id, form_url, extra_context)
+        except OutOfStock as exc:
+            self.message_user(request, str(exc), messages.ERROR)
+            return HttpResponseRedirect(request.get_full_path())
+
+    def save_model(self, request, obj, form, change):
+        if change:
+            save_order(obj)
+        else:
+            super().save_model(request, obj, form, change)
+
+    def save_related(self, request, form, formsets, change):
+        order = form.instance
+        items_changed = any(formset.has_changed() for formset in formsets)
+        cancelled = order.status == "cancelled"
+        reactivated = "status" in form.changed_data and form.initial.get("status") == "cancelled"
+        if change and (cancelled or items_changed):
+            # vuelve lo reservado con los items anteriores, antes de que el inline los reemplace
+            release_orders([order.pk])
+        super().save_related(request, form, formsets, change)
+        if not cancelled and (not change or items_changed or reactivated):
+            reserve_order(order)
+        # los items se editan en el inline: total e item_count se recalculan en SQL
+        order.recalc_total()
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class OrdersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'orders'
+
+    def ready(self):
+        from cotidjango import versioning
+
+        from .models import Order, OrderItem
+
+        versioning.track(Order, OrderItem)
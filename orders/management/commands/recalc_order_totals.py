@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from orders.models import Order, recalc_order_totals
+
+
+class Command(BaseCommand):
+    help = "Recalcula total e item_count de los pedidos a partir de sus items (un solo UPDATE agrupado)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("ids", nargs="*", type=int, help="Pedidos a recalcular (por defecto, todos).")
+        parser.add_argument(
+            "--touch",
+            action="store_true",
+            help="Actualiza también actualizado_en (por defecto no se toca).",
+        )
+
+    def handle(self, *args, **options):
+        orders = Order.objects.all()
+        if options["ids"]:
+            orders = orders.filter(pk__in=options["ids"])
+        total = recalc_order_totals(orders, touch=options["touch"])
+        self.stdout.write(self.style.SUCCESS(f"Pedidos recalculados: {total}"))
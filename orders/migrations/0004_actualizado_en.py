@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-16 20:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_add_approved_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='actualizado_en',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-16 21:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_actualizado_en'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='stock_reservado',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+    ]
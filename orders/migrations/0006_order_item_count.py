@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-16 21:13
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def populate_item_count(apps, schema_editor):
+    Order = apps.get_model('orders', 'Order')
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    units = (
+        OrderItem.objects.filter(order=OuterRef('pk')).order_by().values('order')
+        .annotate(units=Sum('cantidad')).values('units')
+    )
+    Order.objects.update(item_count=Coalesce(Subquery(units), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0005_order_stock_reservado'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_item_count, reverse_code=migrations.RunPython.noop),
+    ]
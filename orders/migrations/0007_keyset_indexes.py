@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-16 22:36
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0006_order_item_count'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['creado_en', 'id'], name='orders_orde_creado__d5cd0e_idx'),
+        ),
+    ]
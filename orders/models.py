@@ -1,7 +1,12 @@
+from decimal import Decimal
+
 from django.conf import settings
 from django.db import models
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
+from cotidjango import versioning
 from products.models import Product
 
 
@@ -27,18 +32,23 @@ class Order(models.Model):
     nota = models.TextField(blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="created")
     total = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    # unidades (suma de cantidades); junto con ``total`` lo mantiene recalc_order_totals
+    item_count = models.PositiveIntegerField(default=0, editable=False)
+    # True mientras el stock de sus items está descontado (se devuelve al cancelar)
+    stock_reservado = models.BooleanField(default=False, editable=False)
     creado_en = models.DateTimeField(default=timezone.now)
+    actualizado_en = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ["-creado_en"]
+        indexes = [models.Index(fields=["creado_en", "id"])]
 
     def __str__(self):
         return f"Pedido #{self.id or ''} - {self.nombre}"
 
     def recalc_total(self):
-        total = sum(item.subtotal for item in self.items.all())
-        self.total = total
-        self.save(update_fields=["total"])
+        recalc_order_totals(Order.objects.filter(pk=self.pk))
+        self.refresh_from_db(fields=["total", "item_count", "actualizado_en"])
 
 
 class OrderItem(models.Model):
@@ -53,3 +63,29 @@ class OrderItem(models.Model):
 
     def __str__(self):
         return f"{self.product} x{self.cantidad}"
+
+
+def recalc_order_totals(orders, touch=True):
+    """Recalcula ``total`` e ``item_count`` de ``orders`` (queryset o ids) con un solo UPDATE.
+
+    Las sumas salen de subconsultas agrupadas por pedido; no se trae ningún
+    item a Python. ``touch=False`` no modifica ``actualizado_en``.
+    """
+    if not isinstance(orders, models.QuerySet):
+        orders = Order.objects.filter(pk__in=list(orders))
+    amount_field = Order._meta.get_field("total")
+    lines = OrderItem.objects.filter(order=OuterRef("pk")).order_by().values("order")
+    amount = lines.annotate(
+        amount=Sum(F("precio_unitario") * F("cantidad"), output_field=amount_field)
+    ).values("amount")
+    units = lines.annotate(units=Sum("cantidad")).values("units")
+    fields = {
+        "total": Coalesce(Subquery(amount), Value(Decimal("0.00")), output_field=amount_field),
+        "item_count": Coalesce(Subquery(units), Value(0)),
+    }
+    if touch:
+        fields["actualizado_en"] = timezone.now()
+    updated = orders.order_by().update(**fields)
+    if updated:
+        versioning.bump(Order)
+    return updated
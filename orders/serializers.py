@@ -1,6 +1,8 @@
+from django.db import transaction
 from rest_framework import serializers
 
 from .models import Order, OrderItem
+from .stock import OutOfStock, line_quantities, release_orders, reserve_order, reserve_stock, save_order
 from products.serializers import ProductSerializer
 from products.models import Product
 
@@ -42,32 +44,49 @@ class OrderSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         items_data = validated_data.pop("items", [])
-        order = Order.objects.create(**validated_data)
-        for item in items_data:
-            product = item["product"]
-            OrderItem.objects.create(
-                order=order,
-                product=product,
-                cantidad=item.get("cantidad", 1),
-                precio_unitario=item.get("precio_unitario", product.precio),
-            )
-        order.recalc_total()
+        try:
+            with transaction.atomic():
+                reserve_stock(line_quantities((item["product"].pk, item.get("cantidad", 1)) for item in items_data))
+                order = Order.objects.create(**validated_data, stock_reservado=True)
+                for item in items_data:
+                    product = item["product"]
+                    OrderItem.objects.create(
+                        order=order,
+                        product=product,
+                        cantidad=item.get("cantidad", 1),
+                        precio_unitario=item.get("precio_unitario", product.precio),
+                    )
+                order.recalc_total()
+        except OutOfStock as exc:
+            raise serializers.ValidationError({"items": [str(exc)]})
         return order
 
     def update(self, instance, validated_data):
         items_data = validated_data.pop("items", None)
+        previous = instance.status
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
-        instance.save()
-        if items_data is not None:
-            instance.items.all().delete()
-            for item in items_data:
-                product = item["product"]
-                OrderItem.objects.create(
-                    order=instance,
-                    product=product,
-                    cantidad=item.get("cantidad", 1),
-                    precio_unitario=item.get("precio_unitario", product.precio),
-                )
-        instance.recalc_total()
+        try:
+            with transaction.atomic():
+                if instance.status == "cancelled" or items_data is not None:
+                    # cancelado o items reemplazados: el stock reservado vuelve
+                    if release_orders([instance.pk]):
+                        instance.stock_reservado = False
+                save_order(instance)
+                if items_data is not None:
+                    instance.items.all().delete()
+                    for item in items_data:
+                        product = item["product"]
+                        OrderItem.objects.create(
+                            order=instance,
+                            product=product,
+                            cantidad=item.get("cantidad", 1),
+                            precio_unitario=item.get("precio_unitario", product.precio),
+                        )
+                reactivated = previous == "cancelled" and instance.status != "cancelled"
+                if instance.status != "cancelled" and (items_data is not None or reactivated):
+                    reserve_order(instance)
+                instance.recalc_total()
+        except OutOfStock as exc:
+            raise serializers.ValidationError({"items": [str(exc)]})
         return instance
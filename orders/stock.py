@@ -0,0 +1,131 @@
+"""Reserva de stock al confirmar pedidos.
+
+Todas las líneas de un pedido se descuentan con un único UPDATE condicional::
+
+    UPDATE product SET stock = stock - CASE id WHEN .. THEN n .. END
+    WHERE id IN (..) AND stock >= CASE id WHEN .. THEN n .. END
+
+Si alguna fila no cumple la condición se revierte todo (nada queda a medias)
+y se informa qué productos no alcanzaron. No hay lectura previa del stock:
+dos checkouts del mismo producto no se pisan ni se serializan más allá del
+lock de fila del propio UPDATE.
+"""
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+from django.utils import timezone
+
+from cotidjango import versioning
+from products.models import Product
+
+from .models import Order, OrderItem
+
+
+class OutOfStock(Exception):
+    def __init__(self, shortages):
+        # [(product, pedido, disponible)]
+        self.shortages = shortages
+        names = ", ".join(f"{p.nombre} (pedido {qty}, disponible {available})" for p, qty, available in shortages)
+        super().__init__(f"Sin stock suficiente: {names}")
+
+    def as_data(self):
+        return [
+            {"productId": p.pk, "name": p.nombre, "requested": qty, "available": available}
+            for p, qty, available in self.shortages
+        ]
+
+
+def line_quantities(lines):
+    """Suma cantidades por producto: ``[(product_id, qty)]`` -> ``{product_id: qty}``."""
+    totals = {}
+    for product_id, qty in lines:
+        totals[product_id] = totals.get(product_id, 0) + int(qty)
+    return {pk: qty for pk, qty in totals.items() if qty > 0}
+
+
+def order_quantities(order_ids):
+    rows = (
+        OrderItem.objects.filter(order_id__in=order_ids)
+        .values("product_id")
+        .annotate(total=Sum("cantidad"))
+        .values_list("product_id", "total")
+    )
+    return {pk: total for pk, total in rows if total}
+
+
+def _per_product(quantities):
+    return Case(
+        *[When(pk=pk, then=Value(qty)) for pk, qty in sorted(quantities.items())],
+        output_field=IntegerField(),
+    )
+
+
+def reserve_stock(quantities):
+    """Descuenta ``{product_id: qty}`` de una vez; ``OutOfStock`` si alguno no alcanza (sin descontar nada)."""
+    if not quantities:
+        return
+    amount = _per_product(quantities)
+    try:
+        with transaction.atomic():
+            updated = Product.objects.filter(pk__in=quantities, stock__gte=amount).update(
+                stock=F("stock") - amount, actualizado_en=timezone.now()
+            )
+            if updated != len(quantities):
+                raise OutOfStock([])
+    except OutOfStock:
+        products = Product.objects.filter(pk__in=quantities).only("pk", "nombre", "stock")
+        found = {p.pk: p for p in products}
+        shortages = [
+            (found[pk], qty, found[pk].stock) for pk, qty in sorted(quantities.items())
+            if pk in found and found[pk].stock < qty
+        ]
+        missing = [pk for pk in quantities if pk not in found]
+        if missing:
+            shortages.extend((Product(pk=pk, nombre=f"#{pk}"), quantities[pk], 0) for pk in missing)
+        raise OutOfStock(shortages)
+    versioning.bump(Product)
+
+
+def release_stock(quantities):
+    if not quantities:
+        return
+    amount = _per_product(quantities)
+    Product.objects.filter(pk__in=quantities).update(stock=F("stock") + amount, actualizado_en=timezone.now())
+    versioning.bump(Product)
+
+
+def save_order(order):
+    """``order.save()`` sin escribir ``stock_reservado``.
+
+    Esa marca solo la cambian ``reserve_order``/``release_orders`` con UPDATEs
+    condicionales; el valor en memoria puede ser viejo si otra cancelación
+    ganó la carrera, y reescribirlo haría devolver el stock dos veces.
+    """
+    fields = [f.name for f in Order._meta.concrete_fields if not f.primary_key and f.name != "stock_reservado"]
+    order.save(update_fields=fields)
+
+
+def reserve_order(order, quantities=None):
+    """Reserva el stock de los items de ``order`` y la marca como reservada."""
+    if quantities is None:
+        quantities = order_quantities([order.pk])
+    with transaction.atomic():
+        reserve_stock(quantities)
+        Order.objects.filter(pk=order.pk).update(stock_reservado=True)
+    order.stock_reservado = True
+
+
+def release_orders(order_ids):
+    """Devuelve el stock de los pedidos que lo tenían reservado; seguro ante cancelaciones repetidas.
+
+    La marca ``stock_reservado`` se baja con un UPDATE condicional antes de
+    sumar, así que dos cancelaciones simultáneas no devuelven el stock dos veces.
+    """
+    released = []
+    with transaction.atomic():
+        for pk in Order.objects.filter(pk__in=order_ids, stock_reservado=True).values_list("pk", flat=True):
+            if Order.objects.filter(pk=pk, stock_reservado=True).update(stock_reservado=False):
+                released.append(pk)
+        if released:
+            release_stock(order_quantities(released))
+            versioning.bump(Order)
+    return released
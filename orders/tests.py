@@ -1,3 +1,103 @@
-from django.test import TestCase
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase
+
+from products.models import Product
+
+from .models import Order, OrderItem
+from .serializers import OrderSerializer
+from .stock import OutOfStock, release_orders, reserve_order, reserve_stock
+
+User = get_user_model()
+
+
+class StockReservationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("stock", "stock@example.com", "x")
+        self.a = Product.objects.create(user=self.user, nombre="A", precio=10, stock=5)
+        self.b = Product.objects.create(user=self.user, nombre="B", precio=10, stock=1)
+
+    def stock(self, product):
+        product.refresh_from_db(fields=["stock"])
+        return product.stock
+
+    def test_reserves_every_line_in_one_statement(self):
+        with self.assertNumQueries(3):  # savepoint + UPDATE + release
+            reserve_stock({self.a.pk: 2, self.b.pk: 1})
+        self.assertEqual((self.stock(self.a), self.stock(self.b)), (3, 0))
+
+    def test_all_or_nothing(self):
+        with self.assertRaises(OutOfStock) as cm:
+            reserve_stock({self.a.pk: 2, self.b.pk: 2})
+        self.assertEqual((self.stock(self.a), self.stock(self.b)), (5, 1))
+        self.assertEqual([s["productId"] for s in cm.exception.as_data()], [self.b.pk])
+
+    def test_release_is_idempotent(self):
+        order = Order.objects.create(user=self.user, nombre="x", email="x@x.com", direccion="d", ciudad="c")
+        OrderItem.objects.create(order=order, product=self.a, cantidad=3, precio_unitario=10)
+        reserve_order(order)
+        self.assertEqual(self.stock(self.a), 2)
+        self.assertEqual(release_orders([order.pk]), [order.pk])
+        self.assertEqual(release_orders([order.pk]), [])
+        self.assertEqual(self.stock(self.a), 5)
+
+    def test_stale_instance_does_not_restore_reservation(self):
+        order = Order.objects.create(user=self.user, nombre="x", email="x@x.com", direccion="d", ciudad="c")
+        OrderItem.objects.create(order=order, product=self.a, cantidad=3, precio_unitario=10)
+        reserve_order(order)
+        stale = Order.objects.get(pk=order.pk)
+        release_orders([order.pk])  # cancelación concurrente
+        serializer = OrderSerializer(stale, data={"nota": "editado"}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        self.assertFalse(Order.objects.get(pk=order.pk).stock_reservado)
+        self.assertEqual(release_orders([order.pk]), [])
+        self.assertEqual(self.stock(self.a), 5)
+
+
+class ConcurrentReservationTests(TransactionTestCase):
+    """Muchos hilos compitiendo por el mismo producto: nunca se vende más de lo que hay."""
+
+    threads = 16
+    attempts_per_thread = 10
+
+    def setUp(self):
+        if connection.vendor == "sqlite" and connection.is_in_memory_db():
+            self.skipTest("SQLite en memoria no admite varias conexiones (ver DATABASES['default']['TEST'])")
+        self.user = User.objects.create_user("hammer", "hammer@example.com", "x")
+        self.hot = Product.objects.create(user=self.user, nombre="Hot", precio=10, stock=50)
+        self.other = Product.objects.create(user=self.user, nombre="Other", precio=10, stock=1000)
+
+    def hammer(self, quantities):
+        start = threading.Barrier(self.threads)
+
+        def worker(_):
+            ok = failed = 0
+            start.wait()
+            try:
+                for _ in range(self.attempts_per_thread):
+                    try:
+                        reserve_stock(quantities)
+                        ok += 1
+                    except OutOfStock:
+                        failed += 1
+            finally:
+                connections.close_all()
+            return ok, failed
+
+        with ThreadPoolExecutor(max_workers=self.threads) as pool:
+            results = list(pool.map(worker, range(self.threads)))
+        return sum(r[0] for r in results), sum(r[1] for r in results)
+
+    def test_never_oversells(self):
+        ok, failed = self.hammer({self.hot.pk: 1, self.other.pk: 2})
+        self.hot.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual(ok, 50)
+        self.assertEqual(failed, self.threads * self.attempts_per_thread - 50)
+        self.assertEqual(self.hot.stock, 0)
+        # all-or-nothing: la otra línea solo se descontó en los pedidos que pasaron
+        self.assertEqual(self.other.stock, 1000 - 2 * ok)
@@ -1,19 +1,18 @@
-from decimal import Decimal
-from urllib.parse import urlparse
-from os.path import basename
-
 import openpyxl
-import requests
 from django.contrib import admin, messages
-from django.core.files.base import ContentFile
-from django.db import transaction
-from django.http import HttpResponse
-from django.shortcuts import redirect
+from django.http import HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404, redirect
 from django.template.response import TemplateResponse
 from django.urls import path, reverse
-from django.utils.text import slugify
+from django.utils import timezone
+
+from cotidjango import versioning
 
-from .models import Product, Category, Offer
+from .exporting import csv_response, xlsx_response
+from .import_jobs import enqueue_from_simulation, enqueue_import, job_status
+from .importing import PRODUCT_HEADERS
+from .models import Product, Category, ImportJob, Offer
+from .pricing import refresh_prices_for_offers
 
 
 @admin.register(Category)
@@ -31,14 +30,9 @@ class ProductAdmin(admin.ModelAdmin):
     list_filter = ("creado_en", "activo", "categoria")
     list_editable = ("precio", "stock", "activo")
     change_list_template = "admin/products/product/change_list.html"
+    actions = ["exportar_xlsx", "exportar_csv"]
 
-    product_headers = [
-        "sku", "parent_sku", "nombre", "slug", "descripcion", "categoria", "subcategoria", "marca",
-        "precio", "costo", "moneda", "stock", "activo", "opcion_1_nombre", "opcion_1_valor",
-        "opcion_2_nombre", "opcion_2_valor", "imagen_1", "imagen_2", "meta_title",
-        "meta_description", "peso", "largo", "ancho", "alto", "es_destacado", "requiere_envio",
-        "gestion_stock",
-    ]
+    product_headers = PRODUCT_HEADERS
 
     sample_rows = [
         {
@@ -111,43 +105,14 @@ class ProductAdmin(admin.ModelAdmin):
                 self.admin_site.admin_view(self.import_xlsx_view),
                 name="products_product_import_xlsx",
             ),
+            path(
+                "importar-xlsx/estado/<int:job_id>/",
+                self.admin_site.admin_view(self.import_status_view),
+                name="products_product_import_status",
+            ),
         ]
         return custom + urls
 
-    def _parse_bool(self, value, default=True):
-        if value is None or value == "":
-            return default
-        if isinstance(value, bool):
-            return value
-        s = str(value).strip().lower()
-        return s in {"true", "1", "si", "sí", "yes", "y"}
-
-    def _parse_decimal(self, value):
-        if value is None or value == "":
-            return None
-        s = str(value).replace("$", "").replace(" ", "").replace(",", ".")
-        try:
-            return Decimal(s)
-        except Exception:
-            return None
-
-    def _parse_int(self, value):
-        if value in (None, ""):
-            return None
-        try:
-            return int(float(value))
-        except Exception:
-            return None
-
-    def _build_slug(self, base):
-        candidate = slugify(base or "")[:110] or "producto"
-        original = candidate
-        i = 1
-        while Product.objects.filter(slug=candidate).exists():
-            i += 1
-            candidate = f"{original}-{i}"
-        return candidate
-
     def _export_workbook(self, rows, filename):
         wb = openpyxl.Workbook()
         ws = wb.active
@@ -169,99 +134,70 @@ class ProductAdmin(admin.ModelAdmin):
             empty_row = {h: "" for h in self.product_headers}
             return self._export_workbook([empty_row], "plantilla_productos.xlsx")
 
-        created = 0
-        updated = 0
-        errors = []
+        if request.method == "POST" and request.POST.get("aplicar", "").isdigit():
+            simulated = get_object_or_404(ImportJob, pk=request.POST["aplicar"], simulacion=True)
+            job = enqueue_from_simulation(simulated, request.user)
+            messages.info(request, f"Importación encolada ({job.nombre_archivo}).")
+            return redirect(f"{reverse('admin:products_product_import_xlsx')}?job={job.pk}")
 
         if request.method == "POST":
             upload = request.FILES.get("file")
             if not upload:
-                messages.error(request, "Selecciona un archivo XLSX.")
+                messages.error(request, "Selecciona un archivo XLSX o CSV.")
                 return redirect(
                     reverse("admin:products_product_import_xlsx")
                 )
             try:
-                wb = openpyxl.load_workbook(upload, data_only=True)
-                sheet = wb.active
-                rows = list(sheet.iter_rows(values_only=True))
-                if not rows:
-                    raise ValueError("El archivo está vacío.")
-                headers = [str(h or "").strip() for h in rows[0]]
-                missing = {"sku", "nombre", "precio"} - set(h.lower() for h in headers)
-                if missing:
-                    errors.append(f"Faltan columnas obligatorias: {', '.join(sorted(missing))}")
-                header_map = {h.strip().lower(): idx for idx, h in enumerate(headers)}
-                with transaction.atomic():
-                    for idx, raw in enumerate(rows[1:], start=2):
-                        data = {h: raw[header_map[h]] if h in header_map and header_map[h] < len(raw) else "" for h in header_map}
-                        # normaliza claves originales (con y sin mayúsculas)
-                        row_data = {k: data.get(k) for k in header_map}
-                        if all(v in ("", None) for v in row_data.values()):
-                            continue
-                        nombre = row_data.get("nombre") or ""
-                        precio = self._parse_decimal(row_data.get("precio"))
-                        if not nombre or precio is None:
-                            errors.append(f"Fila {idx}: nombre y precio son obligatorios.")
-                            continue
-                        slug_src = row_data.get("slug") or row_data.get("sku") or nombre
-                        slug = slugify(slug_src)[:110] or self._build_slug(nombre)
-                        categoria_nombre = row_data.get("categoria") or ""
-                        categoria_obj = None
-                        if categoria_nombre:
-                            categoria_obj, _ = Category.objects.get_or_create(nombre=categoria_nombre)
-                        existing = Product.objects.filter(slug=slug).first()
-                        is_new = existing is None
-                        product = existing or Product(slug=slug, user=request.user)
-                        product.nombre = nombre
-                        product.descripcion = row_data.get("descripcion") or ""
-                        product.precio = precio
-                        stock = self._parse_int(row_data.get("stock"))
-                        product.stock = stock if stock is not None else 0
-                        product.activo = self._parse_bool(row_data.get("activo"), default=True)
-                        product.categoria = categoria_obj
-                        image_url = row_data.get("imagen_1") or ""
-                        if image_url and str(image_url).startswith(("http://", "https://")):
-                            try:
-                                resp = requests.get(str(image_url), stream=True, timeout=8)
-                                if resp.status_code == 200:
-                                    filename = basename(urlparse(str(image_url)).path) or f"{slug}.jpg"
-                                    product.imagen.save(filename, ContentFile(resp.content), save=False)
-                                else:
-                                    errors.append(f"Fila {idx}: no se pudo descargar imagen ({resp.status_code}).")
-                            except Exception as exc:
-                                errors.append(f"Fila {idx}: error descargando imagen ({exc}).")
-                        if is_new and not product.slug:
-                            product.slug = self._build_slug(nombre)
-                        product.save()
-                        if is_new:
-                            created += 1
-                        else:
-                            updated += 1
-                if created or updated:
-                    messages.success(
-                        request,
-                        f"Importación completada. Nuevos: {created} | Actualizados: {updated}",
-                    )
-                if errors:
-                    for err in errors:
-                        messages.error(request, err)
-            except Exception as exc:  # pragma: no cover
-                messages.error(request, f"No se pudo procesar el XLSX: {exc}")
+                job = enqueue_import(upload, request.user, simulacion=bool(request.POST.get("simular")))
+            except Exception as exc:
+                messages.error(request, f"No se pudo procesar el archivo: {exc}")
                 return redirect(reverse("admin:products_product_import_xlsx"))
+            label = "Simulación" if job.simulacion else "Importación"
+            messages.info(request, f"{label} encolada ({job.nombre_archivo}).")
+            return redirect(f"{reverse('admin:products_product_import_xlsx')}?job={job.pk}")
+
+        job = None
+        if request.GET.get("job", "").isdigit():
+            job = ImportJob.objects.filter(pk=request.GET["job"]).first()
 
         context = {
             **self.admin_site.each_context(request),
             "opts": self.model._meta,
-            "title": "Importar productos via XLSX",
+            "title": "Importar productos via XLSX o CSV",
             "headers": self.product_headers,
             "example_url": f"{reverse('admin:products_product_import_xlsx')}?sample=1",
             "template_url": f"{reverse('admin:products_product_import_xlsx')}?template=1",
-            "created": created,
-            "updated": updated,
-            "errors": errors,
+            "job": job,
+            "job_progress": job_status(job)["progreso"] if job else 0,
+            "status_url": reverse("admin:products_product_import_status", args=[job.pk]) if job else "",
+            "recent_jobs": ImportJob.objects.select_related("user")[:10],
         }
         return TemplateResponse(request, "admin/products/product/import_xlsx.html", context)
 
+    def import_status_view(self, request, job_id):
+        return JsonResponse(job_status(get_object_or_404(ImportJob, pk=job_id)))
+
+    @admin.action(description="Exportar seleccionados a XLSX")
+    def exportar_xlsx(self, request, queryset):
+        return xlsx_response(queryset, request)
+
+    @admin.action(description="Exportar seleccionados a CSV")
+    def exportar_csv(self, request, queryset):
+        return csv_response(queryset, request)
+
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = (
+        "nombre_archivo", "estado", "simulacion", "filas_procesadas", "filas_total", "creados", "actualizados",
+        "sin_cambios", "total_errores", "user", "creado_en", "terminado_en",
+    )
+    list_filter = ("estado", "simulacion", "creado_en")
+    readonly_fields = [f.name for f in ImportJob._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
 
 @admin.register(Offer)
 class OfferAdmin(admin.ModelAdmin):
@@ -274,8 +210,12 @@ class OfferAdmin(admin.ModelAdmin):
 
     @admin.action(description="Activar ofertas seleccionadas")
     def activar_ofertas(self, request, queryset):
-        queryset.update(activo=True)
+        queryset.update(activo=True, actualizado_en=timezone.now())
+        versioning.bump(Offer)
+        refresh_prices_for_offers(queryset)
 
     @admin.action(description="Desactivar ofertas seleccionadas")
     def desactivar_ofertas(self, request, queryset):
-        queryset.update(activo=False)
+        queryset.update(activo=False, actualizado_en=timezone.now())
+        versioning.bump(Offer)
+        refresh_prices_for_offers(queryset)
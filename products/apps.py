@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class ProductsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'products'
+
+    def ready(self):
+        from cotidjango import versioning
+
+        from . import signals  # noqa: F401
+        from .models import Category, CategoryClosure, EffectivePrice, Offer, Product
+
+        versioning.track(Product, Category, CategoryClosure, Offer, EffectivePrice)
@@ -0,0 +1,33 @@
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from cotidjango import versioning
+
+from .models import Category, CategoryClosure, EffectivePrice, Offer, Product
+
+CATALOG_MODELS = (Product, Category, CategoryClosure, Offer, EffectivePrice)
+
+
+def catalog_version():
+    """Sello que cambia con cualquier alta, baja o edición del catálogo."""
+    return versioning.table_versions(CATALOG_MODELS)
+
+
+def catalog_stamp(now=None):
+    """Devuelve ``(token, last_modified)`` del catálogo público.
+
+    Además de las versiones de tabla incluye el último inicio/fin de oferta ya
+    ocurrido: el catálogo cambia cuando una oferta entra o sale de vigencia
+    aunque nadie haya escrito en la base.
+    """
+    now = now or timezone.now()
+    offers = Offer.objects.aggregate(
+        changed=Max("actualizado_en"),
+        started=Max("empieza", filter=Q(empieza__lte=now)),
+        ended=Max("termina", filter=Q(termina__lt=now)),
+    )
+    products = Product.objects.aggregate(changed=Max("actualizado_en"))
+    moments = [m for m in (offers["changed"], offers["started"], offers["ended"], products["changed"]) if m]
+    last_modified = max(moments) if moments else None
+    token = f"{catalog_version()}:{offers['started']}:{offers['ended']}:{last_modified}"
+    return token, last_modified
@@ -0,0 +1,235 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from django.utils.text import slugify
+
+from cotidjango import versioning
+
+from .models import Category, CategoryClosure, Product
+from .search import index_products
+
+
+def closure_rows(parents):
+    """Calcula las filas de la clausura a partir de ``{id: parent_id}`` (tolera ciclos)."""
+    rows = []
+    for node_id in parents:
+        rows.append((node_id, node_id, 0))
+        seen = {node_id}
+        parent_id = parents.get(node_id)
+        depth = 1
+        while parent_id and parent_id in parents and parent_id not in seen:
+            rows.append((parent_id, node_id, depth))
+            seen.add(parent_id)
+            parent_id = parents.get(parent_id)
+            depth += 1
+    return rows
+
+
+def rebuild_category_closure():
+    parents = dict(Category.objects.values_list("id", "parent_id"))
+    table = connection.ops.quote_name(CategoryClosure._meta.db_table)
+    with transaction.atomic():
+        # DELETE directo: con el collector del ORM se borraría de a lotes, fila por fila
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {table}")
+        CategoryClosure.objects.bulk_create(
+            [CategoryClosure(ancestor_id=a, descendant_id=d, depth=depth) for a, d, depth in closure_rows(parents)],
+            batch_size=1000,
+        )
+    versioning.bump(CategoryClosure)
+
+
+def add_category_to_closure(category):
+    """Alta de una hoja: copia los ancestros del padre (una consulta + un insert)."""
+    rows = [CategoryClosure(ancestor_id=category.pk, descendant_id=category.pk, depth=0)]
+    if category.parent_id:
+        for ancestor_id, depth in CategoryClosure.objects.filter(
+            descendant_id=category.parent_id
+        ).values_list("ancestor_id", "depth"):
+            rows.append(CategoryClosure(ancestor_id=ancestor_id, descendant_id=category.pk, depth=depth + 1))
+    CategoryClosure.objects.bulk_create(rows, ignore_conflicts=True)
+    versioning.bump(CategoryClosure)
+
+
+def sync_category_closure(category, created=False):
+    if created:
+        add_category_to_closure(category)
+        return
+    links = dict(
+        CategoryClosure.objects.filter(descendant_id=category.pk, depth__lte=1).values_list("depth", "ancestor_id")
+    )
+    # rebuild completo solo si cambió el padre (mueve todo el subárbol)
+    if 0 not in links or links.get(1) != category.parent_id:
+        rebuild_category_closure()
+
+
+def filter_by_category(qs, slug, field="categoria"):
+    """Productos de la categoría ``slug`` o de cualquiera de sus subcategorías."""
+    return qs.filter(**{f"{field}__ancestor_links__ancestor__slug": slug})
+
+
+def _cache():
+    return caches[getattr(settings, "CATALOG_CACHE_ALIAS", "default")]
+
+
+def _build_tree():
+    counts = dict(
+        CategoryClosure.objects.values("ancestor_id")
+        .annotate(n=Count("descendant__products", filter=Q(descendant__products__activo=True)))
+        .values_list("ancestor_id", "n")
+    )
+    nodes = {}
+    order = []
+    for cat in Category.objects.order_by("nombre").values("id", "nombre", "slug", "parent_id"):
+        nodes[cat["id"]] = {
+            "id": cat["id"],
+            "nombre": cat["nombre"],
+            "slug": cat["slug"],
+            "parent": cat["parent_id"],
+            "productos_activos": counts.get(cat["id"], 0),
+            "hijos": [],
+        }
+        order.append(cat["id"])
+    roots = []
+    for node_id in order:
+        node = nodes[node_id]
+        parent = nodes.get(node["parent"])
+        if parent is not None and parent is not node:
+            parent["hijos"].append(node)
+        else:
+            roots.append(node)
+    return roots
+
+
+def category_tree():
+    """Árbol completo con conteo de productos activos (incluye subcategorías), cacheado por versión."""
+    from .catalog import catalog_version
+
+    key = f"category-tree:{catalog_version()}"
+    cache = _cache()
+    tree = cache.get(key)
+    if tree is None:
+        tree = _build_tree()
+        cache.set(key, tree, getattr(settings, "CATALOG_CACHE_TIMEOUT", 600))
+    return tree
+
+
+def category_list():
+    """Lista plana (alfabética) del árbol cacheado, con ``depth``, para templates y selects."""
+    flat = []
+
+    def walk(nodes, depth):
+        for node in nodes:
+            flat.append({**{k: v for k, v in node.items() if k != "hijos"}, "depth": depth})
+            walk(node["hijos"], depth + 1)
+
+    walk(category_tree(), 0)
+    return sorted(flat, key=lambda n: n["nombre"])
+
+
+CHILD_KEYS = ("hijos", "subcategorias", "children")
+
+
+def flatten_category_tree(tree):
+    """Aplana un árbol JSON de cualquier profundidad a ``[(slug, nombre, slug_padre)]``, padres primero.
+
+    Cada nodo es un string (el nombre) o un dict con ``nombre``/``name``,
+    ``slug`` opcional e hijos en ``hijos``, ``subcategorias`` o ``children``
+    (el formato de ``/api/categories/tree/`` sirve tal cual).
+    """
+    flat = []
+    seen = {}
+    names = {}
+    stack = [(node, None) for node in reversed(list(tree))]
+    while stack:
+        node, parent_slug = stack.pop()
+        if isinstance(node, str):
+            node = {"nombre": node}
+        if not isinstance(node, dict):
+            raise ValueError(f"Nodo inválido: {node!r}")
+        nombre = str(node.get("nombre") or node.get("name") or "").strip()
+        if not nombre:
+            raise ValueError(f"Nodo sin nombre: {node!r}")
+        slug = slugify(node.get("slug") or nombre)[:110]
+        if not slug or len(nombre) > 100:
+            raise ValueError(f"Nombre inválido: {nombre!r}")
+        if slug in seen:
+            raise ValueError(f"Categoría repetida: {nombre!r} (slug {slug!r}, también {seen[slug]!r})")
+        if nombre in names:
+            # Category.nombre es único: dos nodos con el mismo nombre fallarían recién en el INSERT
+            raise ValueError(f"Categoría repetida: {nombre!r} (slugs {names[nombre]!r} y {slug!r})")
+        seen[slug] = nombre
+        names[nombre] = slug
+        flat.append((slug, nombre, parent_slug))
+        children = next((node[k] for k in CHILD_KEYS if node.get(k)), [])
+        stack.extend((child, slug) for child in reversed(list(children)))
+    return flat
+
+
+def sync_category_tree(tree, dry_run=False):
+    """Crea/actualiza las categorías de ``tree`` con un diff en memoria y escrituras en bloque.
+
+    Las existentes se buscan por slug (o por nombre); las que no están en el
+    árbol no se tocan. Una consulta de lectura, un ``bulk_create``, un
+    ``bulk_update`` y el rebuild de la clausura, todo en una transacción.
+    Devuelve ``{"creadas", "actualizadas", "sin_cambios"}``.
+    """
+    nodes = flatten_category_tree(tree)
+    existing = {c.slug: c for c in Category.objects.only("id", "slug", "nombre", "parent_id")}
+    by_name = {c.nombre: c for c in existing.values()}
+
+    matched = {}
+    to_create = []
+    for slug, nombre, _ in nodes:
+        category = existing.get(slug) or by_name.get(nombre)
+        if category is None:
+            category = Category(slug=slug, nombre=nombre)
+            to_create.append(category)
+        matched[slug] = category
+
+    report = {"creadas": len(to_create), "actualizadas": 0, "sin_cambios": 0}
+    if dry_run:
+        for slug, nombre, parent_slug in nodes:
+            category = matched[slug]
+            if category.pk is not None:
+                parent = matched.get(parent_slug)
+                same_parent = category.parent_id == (parent.pk if parent else None)
+                key = "sin_cambios" if category.nombre == nombre and same_parent else "actualizadas"
+                report[key] += 1
+        return report
+
+    with transaction.atomic():
+        if to_create:
+            Category.objects.bulk_create(to_create, batch_size=1000)
+            if any(c.pk is None for c in to_create):
+                # backends sin RETURNING
+                ids = dict(Category.objects.filter(slug__in=[c.slug for c in to_create]).values_list("slug", "id"))
+                for category in to_create:
+                    category.pk = ids[category.slug]
+        created = {id(c) for c in to_create}
+        to_update = []
+        renamed = []
+        parents_changed = bool(to_create)
+        for slug, nombre, parent_slug in nodes:
+            category = matched[slug]
+            parent_id = matched[parent_slug].pk if parent_slug else None
+            if category.nombre == nombre and category.parent_id == parent_id:
+                report["sin_cambios"] += id(category) not in created
+                continue
+            parents_changed |= category.parent_id != parent_id
+            if id(category) not in created:
+                report["actualizadas"] += 1
+                if category.nombre != nombre:
+                    renamed.append(category.pk)
+            category.nombre = nombre
+            category.parent_id = parent_id
+            to_update.append(category)
+        if to_update:
+            Category.objects.bulk_update(to_update, ["nombre", "parent"], batch_size=500)
+        if renamed:
+            index_products(Product.objects.filter(categoria_id__in=renamed).values_list("pk", flat=True))
+        if parents_changed:
+            rebuild_category_closure()
+        versioning.bump(Category)
+    return report
@@ -0,0 +1,97 @@
+"""Export del catálogo con el mismo esquema de columnas que la plantilla de import.
+
+Ambos formatos recorren la base con ``.iterator()`` por lotes: XLSX con
+openpyxl en modo ``write_only`` (a un archivo temporal) y CSV en streaming,
+así que la memoria no depende de la cantidad de productos.
+"""
+import csv
+import io
+import tempfile
+
+import openpyxl
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+
+from cotidjango.catalog_export import iter_chunks
+
+from .importing import PRODUCT_HEADERS
+
+EXPORT_FIELDS = (
+    "pk", "slug", "nombre", "descripcion", "precio", "stock", "activo", "imagen", "categoria__nombre",
+)
+
+
+def export_queryset(queryset):
+    return queryset.select_related("categoria").only(*EXPORT_FIELDS).order_by("pk")
+
+
+def product_row(product, request=None):
+    """Fila lista para re-importar: ``sku``/``slug`` identifican al producto."""
+    imagen = ""
+    if product.imagen:
+        imagen = str(product.imagen.name)
+        if not imagen.startswith("http"):
+            imagen = request.build_absolute_uri(product.imagen.url) if request else product.imagen.url
+    return {
+        "sku": product.slug,
+        "nombre": product.nombre,
+        "slug": product.slug,
+        "descripcion": product.descripcion,
+        "categoria": product.categoria.nombre if product.categoria else "",
+        "precio": product.precio,
+        "stock": product.stock,
+        "activo": product.activo,
+        "imagen_1": imagen,
+    }
+
+
+def iter_rows(queryset, request=None):
+    for chunk in iter_chunks(export_queryset(queryset)):
+        for product in chunk:
+            row = product_row(product, request)
+            yield [row.get(h, "") for h in PRODUCT_HEADERS]
+
+
+def _filename(ext):
+    return f"productos-{timezone.now():%Y%m%d%H%M%S}.{ext}"
+
+
+def xlsx_response(queryset, request=None):
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Productos")
+    ws.append(PRODUCT_HEADERS)
+    for row in iter_rows(queryset, request):
+        ws.append(row)
+    tmp = tempfile.TemporaryFile()
+    wb.save(tmp)
+    tmp.seek(0)
+    return FileResponse(
+        tmp,
+        as_attachment=True,
+        filename=_filename("xlsx"),
+        content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    )
+
+
+def iter_csv(queryset, request=None, chunk_rows=500):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM: Excel abre el CSV como UTF-8
+    buffer.write("\ufeff")
+    writer.writerow(PRODUCT_HEADERS)
+    pending = 0
+    for row in iter_rows(queryset, request):
+        writer.writerow(row)
+        pending += 1
+        if pending >= chunk_rows:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    yield buffer.getvalue().encode("utf-8")
+
+
+def csv_response(queryset, request=None):
+    response = StreamingHttpResponse(iter_csv(queryset, request), content_type="text/csv; charset=utf-8")
+    response["Content-Disposition"] = f'attachment; filename="{_filename("csv")}"'
+    return response
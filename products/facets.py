@@ -0,0 +1,122 @@
+import hashlib
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count, Q
+
+from .catalog import catalog_version
+from .categories import filter_by_category
+
+
+def price_edges():
+    return [Decimal(str(edge)) for edge in getattr(settings, "FACET_PRICE_BUCKETS", (1000, 2500, 5000, 10000))]
+
+
+def _price_q(min_price, max_price):
+    q = Q()
+    if min_price is not None:
+        q &= Q(precio_efectivo__precio_final__gte=min_price)
+    if max_price is not None:
+        q &= Q(precio_efectivo__precio_final__lte=max_price)
+    return q
+
+
+def _stock_q(in_stock):
+    if in_stock is None:
+        return Q()
+    return Q(stock__gt=0) if in_stock else Q(stock=0)
+
+
+def filter_in_stock(qs, in_stock):
+    return qs.filter(_stock_q(in_stock))
+
+
+def _bucket_ranges():
+    bounds = [None, *price_edges(), None]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _category_counts(qs):
+    rows = (
+        qs.order_by()
+        .values(
+            "categoria__ancestor_links__ancestor_id",
+            "categoria__ancestor_links__ancestor__slug",
+            "categoria__ancestor_links__ancestor__nombre",
+        )
+        .annotate(n=Count("id"))
+    )
+    counts = [
+        {
+            "id": row["categoria__ancestor_links__ancestor_id"],
+            "slug": row["categoria__ancestor_links__ancestor__slug"],
+            "name": row["categoria__ancestor_links__ancestor__nombre"],
+            "count": row["n"],
+        }
+        for row in rows
+        if row["categoria__ancestor_links__ancestor_id"] is not None
+    ]
+    return sorted(counts, key=lambda c: (-c["count"], c["name"]))
+
+
+def _price_and_stock_counts(qs, min_price, max_price, in_stock):
+    price_q = _price_q(min_price, max_price)
+    stock_q = _stock_q(in_stock)
+    aggregates = {
+        "total": Count("id", filter=price_q & stock_q),
+        "in_stock": Count("id", filter=price_q & Q(stock__gt=0)),
+        "out_of_stock": Count("id", filter=price_q & Q(stock=0)),
+    }
+    ranges = _bucket_ranges()
+    for i, (low, high) in enumerate(ranges):
+        bucket = Q(precio_efectivo__precio_final__isnull=False)
+        if low is not None:
+            bucket &= Q(precio_efectivo__precio_final__gte=low)
+        if high is not None:
+            bucket &= Q(precio_efectivo__precio_final__lt=high)
+        aggregates[f"b{i}"] = Count("id", filter=bucket & stock_q)
+    result = qs.order_by().aggregate(**aggregates)
+    return {
+        "total": result["total"],
+        "price": [
+            {
+                "min": float(low) if low is not None else None,
+                "max": float(high) if high is not None else None,
+                "count": result[f"b{i}"],
+            }
+            for i, (low, high) in enumerate(ranges)
+        ],
+        "stock": {"inStock": result["in_stock"], "outOfStock": result["out_of_stock"]},
+    }
+
+
+def compute_facets(qs, category=None, min_price=None, max_price=None, in_stock=None):
+    """Conteos por categoría, rango de precio y stock para la búsqueda actual.
+
+    ``qs`` es la consulta base (activos + texto) sin los filtros de faceta. Cada
+    grupo se cuenta aplicando los filtros de los otros grupos pero no el propio,
+    así el usuario ve cuánto obtendría al cambiar esa selección. Son dos
+    consultas: un GROUP BY sobre la clausura de categorías (incluye
+    subcategorías) y un único aggregate con COUNT filtrados para precio y stock.
+    El resultado se cachea por firma SQL de la consulta + ``catalog_version()``.
+    """
+    by_category = filter_in_stock(qs, in_stock).filter(_price_q(min_price, max_price))
+    by_price_and_stock = filter_by_category(qs, category) if category else qs
+    raw = "|".join(
+        f"{sql}|{params!r}"
+        for sql, params in (q.order_by().query.sql_with_params() for q in (by_category, by_price_and_stock))
+    )
+    raw += "|" + ",".join(str(edge) for edge in price_edges())
+    key = f"facets:{hashlib.sha1(raw.encode('utf-8')).hexdigest()}:{catalog_version()}"
+    cache = caches[getattr(settings, "CATALOG_CACHE_ALIAS", "default")]
+    facets = cache.get(key)
+    if facets is not None:
+        return facets
+
+    facets = {
+        "categories": _category_counts(by_category),
+        **_price_and_stock_counts(by_price_and_stock, min_price, max_price, in_stock),
+    }
+    cache.set(key, facets, getattr(settings, "CATALOG_CACHE_TIMEOUT", 600))
+    return facets
@@ -0,0 +1,202 @@
+"""Cola de imports de productos (XLSX/CSV): el admin encola y ``process_import_jobs`` procesa.
+
+Un worker toma un job con un UPDATE condicional (solo uno gana) y va
+guardando el checkpoint en cada lote. Si el worker muere, el job queda "en
+curso" sin latido; pasado ``IMPORT_JOB_STALE_SECONDS`` otro worker lo retoma
+desde ``filas_procesadas``.
+"""
+import logging
+import os
+import socket
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .importing import ProductImporter, import_format, iter_import_rows
+from .models import ImportJob
+
+logger = logging.getLogger(__name__)
+
+MAX_STORED_ERRORS = 500
+HEARTBEAT_SECONDS = 10
+
+
+class JobLost(Exception):
+    """Otro worker tomó el job (este se consideró caído)."""
+
+
+def stale_after():
+    return timedelta(seconds=getattr(settings, "IMPORT_JOB_STALE_SECONDS", 300))
+
+
+def max_attempts():
+    return getattr(settings, "IMPORT_JOB_MAX_ATTEMPTS", 3)
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def enqueue_import(upload, user, simulacion=False):
+    fmt = import_format(upload)
+    job = ImportJob(user=user, nombre_archivo=os.path.basename(upload.name or "")[:255], simulacion=simulacion)
+    job.archivo.save(job.nombre_archivo or f"import.{fmt}", upload, save=False)
+    job.save()
+    return job
+
+
+def enqueue_from_simulation(job, user):
+    """Encola el import real del mismo archivo que ya se simuló."""
+    return ImportJob.objects.create(user=user, archivo=job.archivo.name, nombre_archivo=job.nombre_archivo)
+
+
+def _fail_exhausted(now):
+    """Los jobs que ya tumbaron al worker ``max_attempts`` veces no se reintentan más."""
+    ImportJob.objects.filter(
+        estado__in=ImportJob.EN_CURSO,
+        actualizado_en__lt=now - stale_after(),
+        intentos__gte=max_attempts(),
+    ).update(
+        estado=ImportJob.ERROR,
+        mensaje="El import se interrumpió demasiadas veces.",
+        terminado_en=now,
+        actualizado_en=now,
+    )
+
+
+def claim_next_job(worker=None):
+    """Toma el próximo job pendiente (o uno abandonado); ``None`` si no hay."""
+    worker = worker or worker_name()
+    now = timezone.now()
+    _fail_exhausted(now)
+    available = ImportJob.objects.filter(
+        Q(estado=ImportJob.PENDIENTE)
+        | Q(estado__in=ImportJob.EN_CURSO, actualizado_en__lt=now - stale_after())
+    ).order_by("creado_en")
+    for job in available.only("pk", "estado", "actualizado_en")[:10]:
+        taken = ImportJob.objects.filter(
+            pk=job.pk, estado=job.estado, actualizado_en=job.actualizado_en
+        ).update(
+            estado=ImportJob.DESCARGANDO,
+            worker=worker,
+            intentos=F("intentos") + 1,
+            iniciado_en=now,
+            actualizado_en=now,
+        )
+        if taken:
+            return ImportJob.objects.get(pk=job.pk)
+    return None
+
+
+class JobRunner:
+    def __init__(self, job, chunk_size=None):
+        self.job = job
+        self.importer = ProductImporter(job.user, chunk_size=chunk_size)
+        result = self.importer.result
+        result.created = job.creados
+        result.updated = job.actualizados
+        result.unchanged = job.sin_cambios
+        result.errors = list(job.errores)
+        # errores que no entraron en la lista guardada en corridas anteriores
+        self.dropped_errors = job.total_errores - len(job.errores)
+        self.last_beat = time.monotonic()
+
+    def _update(self, **fields):
+        fields["actualizado_en"] = timezone.now()
+        if not ImportJob.objects.filter(pk=self.job.pk, worker=self.job.worker).update(**fields):
+            raise JobLost(self.job.pk)
+        self.last_beat = time.monotonic()
+
+    def heartbeat(self, *args):
+        if time.monotonic() - self.last_beat >= HEARTBEAT_SECONDS:
+            self._update()
+
+    def checkpoint(self, processed):
+        result = self.importer.result
+        self._update(
+            filas_procesadas=processed,
+            creados=result.created,
+            actualizados=result.updated,
+            sin_cambios=result.unchanged,
+            errores=result.errors[:MAX_STORED_ERRORS],
+            total_errores=self.dropped_errors + len(result.errors),
+        )
+
+    def run(self):
+        job = self.job
+        if job.simulacion:
+            return self.simulate()
+        with job.archivo.open("rb") as fh:
+            self.importer.fetch_images(iter_import_rows(fh), progress=self.heartbeat)
+            self._update(estado=ImportJob.IMPORTANDO, filas_total=self.importer.total_rows)
+            fh.seek(0)
+            self.importer.run(iter_import_rows(fh), start_after=job.filas_procesadas, checkpoint=self.checkpoint)
+        self._update(estado=ImportJob.COMPLETADO, terminado_en=timezone.now())
+
+    def simulate(self):
+        # solo lectura: si se corta, se vuelve a calcular entera
+        self.importer.result.errors = []
+        with self.job.archivo.open("rb") as fh:
+            report = self.importer.diff(iter_import_rows(fh))
+        errors = report.pop("errores")
+        self._update(
+            estado=ImportJob.COMPLETADO,
+            terminado_en=timezone.now(),
+            resumen=report,
+            filas_total=self.importer.total_rows,
+            filas_procesadas=self.importer.total_rows,
+            creados=report["nuevos"],
+            actualizados=report["modificados"],
+            sin_cambios=report["sin_cambios"],
+            errores=errors[:MAX_STORED_ERRORS],
+            total_errores=len(errors),
+        )
+
+
+def run_job(job, chunk_size=None):
+    """Procesa un job ya tomado; los errores quedan registrados en el job."""
+    runner = JobRunner(job, chunk_size=chunk_size)
+    try:
+        runner.run()
+    except JobLost:
+        logger.warning("El import %s lo tomó otro worker", job.pk)
+        return None
+    except Exception as exc:
+        logger.exception("Falló el import %s", job.pk)
+        try:
+            runner._update(estado=ImportJob.ERROR, mensaje=str(exc)[:2000], terminado_en=timezone.now())
+        except JobLost:
+            return None
+    job.refresh_from_db()
+    return job
+
+
+def job_status(job):
+    total = job.filas_total
+    progress = None
+    if job.estado == ImportJob.COMPLETADO:
+        progress = 100
+    elif total:
+        progress = min(100, int(job.filas_procesadas * 100 / total))
+    return {
+        "id": job.pk,
+        "estado": job.estado,
+        "estadoLabel": job.get_estado_display(),
+        "archivo": job.nombre_archivo,
+        "filasTotal": total,
+        "filasProcesadas": job.filas_procesadas,
+        "creados": job.creados,
+        "actualizados": job.actualizados,
+        "sinCambios": job.sin_cambios,
+        "totalErrores": job.total_errores,
+        "errores": job.errores[:50],
+        "mensaje": job.mensaje,
+        "progreso": progress,
+        "terminado": job.terminado,
+        "simulacion": job.simulacion,
+        "resumen": job.resumen,
+        "actualizadoEn": job.actualizado_en,
+    }
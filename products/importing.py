@@ -0,0 +1,463 @@
+"""Importación masiva de productos (XLSX o CSV) en streaming y con escrituras por lotes."""
+import csv
+import gzip
+import hashlib
+import io
+import json
+from decimal import Decimal
+
+import openpyxl
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from cotidjango import versioning
+
+from .models import Category, Product
+from .pricing import refresh_effective_prices
+from .remote_images import RemoteImageCache, is_remote
+from .search import index_products
+from .slugs import SlugAllocator
+
+PRODUCT_HEADERS = [
+    "sku", "parent_sku", "nombre", "slug", "descripcion", "categoria", "subcategoria", "marca",
+    "precio", "costo", "moneda", "stock", "activo", "opcion_1_nombre", "opcion_1_valor",
+    "opcion_2_nombre", "opcion_2_valor", "imagen_1", "imagen_2", "meta_title",
+    "meta_description", "peso", "largo", "ancho", "alto", "es_destacado", "requiere_envio",
+    "gestion_stock",
+]
+REQUIRED_COLUMNS = {"sku", "nombre", "precio"}
+XLSX_MAGIC = b"PK\x03\x04"
+GZIP_MAGIC = b"\x1f\x8b"
+UPDATE_FIELDS = [
+    "nombre", "descripcion", "precio", "stock", "activo", "categoria", "imagen", "import_fingerprint", "actualizado_en",
+]
+# columnas que entran en la huella de cada fila (las que el import realmente aplica)
+FINGERPRINT_FIELDS = ("nombre", "descripcion", "precio", "stock", "activo", "categoria", "imagen_url")
+# las que además se comparan contra los valores actuales de la base (la URL de imagen no se guarda)
+STATE_FIELDS = FINGERPRINT_FIELDS[:-1]
+DIFF_SAMPLE_SIZE = 50
+
+
+def parse_bool(value, default=True):
+    if value is None or value == "":
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in {"true", "1", "si", "sí", "yes", "y"}
+
+
+def parse_decimal(value):
+    if value is None or value == "":
+        return None
+    s = str(value).replace("$", "").replace(" ", "").replace(",", ".")
+    try:
+        return Decimal(s)
+    except Exception:
+        return None
+
+
+def parse_int(value):
+    if value in (None, ""):
+        return None
+    try:
+        return int(float(value))
+    except Exception:
+        return None
+
+
+def header_names(header_row):
+    headers = [str(h or "").strip().lower() for h in header_row]
+    missing = REQUIRED_COLUMNS - set(headers)
+    if missing:
+        raise ValueError(f"Faltan columnas obligatorias: {', '.join(sorted(missing))}")
+    return headers
+
+
+def iter_xlsx_rows(upload):
+    """Lee la hoja activa en modo ``read_only``: una fila en memoria a la vez.
+
+    Produce ``(numero_de_fila, {columna_en_minusculas: valor})``. La primera fila
+    son los encabezados.
+    """
+    wb = openpyxl.load_workbook(upload, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header_row = next(rows, None)
+        if header_row is None:
+            raise ValueError("El archivo está vacío.")
+        headers = header_names(header_row)
+        for idx, raw in enumerate(rows, start=2):
+            yield idx, {h: raw[i] if i < len(raw) else "" for i, h in enumerate(headers) if h}
+    finally:
+        wb.close()
+
+
+def iter_csv_rows(upload):
+    """Igual que ``iter_xlsx_rows`` para CSV (UTF-8, opcionalmente gzip), leyendo de a una línea.
+
+    El separador (``,``, ``;`` o tab) se detecta con la línea de encabezados.
+    """
+    upload.seek(0)
+    raw = gzip.GzipFile(fileobj=upload, mode="rb") if upload.read(2) == GZIP_MAGIC else upload
+    upload.seek(0)
+    text = io.TextIOWrapper(raw, encoding="utf-8-sig", newline="")
+    idx = 1
+    try:
+        first = text.readline()
+        if not first.strip():
+            raise ValueError("El archivo está vacío.")
+        try:
+            dialect = csv.Sniffer().sniff(first, delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        headers = header_names(next(csv.reader([first], dialect)))
+        for idx, raw_row in enumerate(csv.reader(text, dialect), start=2):
+            yield idx, {h: raw_row[i] if i < len(raw_row) else "" for i, h in enumerate(headers) if h}
+    except csv.Error as exc:
+        raise ValueError(f"CSV inválido cerca de la fila {idx + 1}: {exc}") from exc
+    except UnicodeDecodeError as exc:
+        # se decodifica por bloques: la fila es aproximada
+        raise ValueError(f"El CSV no está en UTF-8 (cerca de la fila {idx + 1}).") from exc
+    finally:
+        text.detach()
+        if raw is not upload:
+            raw.close()
+
+
+def import_format(upload):
+    """``"xlsx"`` o ``"csv"`` según los primeros bytes (XLSX es un zip)."""
+    upload.seek(0)
+    head = upload.read(4)
+    upload.seek(0)
+    if head == XLSX_MAGIC:
+        return "xlsx"
+    if not head:
+        raise ValueError("El archivo está vacío.")
+    return "csv"
+
+
+def iter_import_rows(upload):
+    if import_format(upload) == "xlsx":
+        return iter_xlsx_rows(upload)
+    return iter_csv_rows(upload)
+
+
+def row_fingerprint(values, fields=FINGERPRINT_FIELDS):
+    """sha1 de los valores normalizados de una fila: misma huella, mismo resultado al aplicarla."""
+    payload = [str(values[f]) for f in fields]
+    return hashlib.sha1(json.dumps(payload, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.errors = []
+
+
+class ProductImporter:
+    """Aplica filas de productos con ``bulk_create``/``bulk_update`` por lotes.
+
+    Categorías y slugs existentes se precargan en diccionarios, así que cada
+    lote cuesta una consulta de lectura (productos a actualizar) y dos
+    escrituras, sin importar cuántas filas tenga.
+    """
+
+    chunk_size = 1000
+
+    def __init__(self, user, chunk_size=None):
+        self.user = user
+        self.chunk_size = chunk_size or self.chunk_size
+        self.result = ImportResult()
+        self.categories = {}
+        self.slugs = {}
+        self.fingerprints = {}
+        self.slug_allocator = SlugAllocator(Product, default="producto")
+        self.images = {}
+        self.total_rows = None
+        self.changed = False
+
+    def preload(self):
+        """Carga categorías, slugs y, por producto importado, ``(huella, huella del estado actual)``.
+
+        La huella guardada solo dice qué fila se importó por última vez; el
+        estado se recalcula desde la base porque stock, ``activo``, etc. también
+        cambian por ``queryset.update()`` (reservas, acciones del admin) sin pasar
+        por ``save()``.
+        """
+        self.categories = {c.nombre: c for c in Category.objects.all()}
+        self.slugs = {}
+        self.fingerprints = {}
+        rows = Product.objects.values_list(
+            "slug", "pk", "import_fingerprint",
+            "nombre", "descripcion", "precio", "stock", "activo", "categoria__nombre",
+        )
+        for slug, pk, fingerprint, *state in rows.iterator(chunk_size=self.chunk_size):
+            self.slugs[slug] = pk
+            if fingerprint:
+                current = dict(zip(STATE_FIELDS, state))
+                current["categoria"] = current["categoria"] or ""
+                self.fingerprints[slug] = (fingerprint, row_fingerprint(current, STATE_FIELDS))
+
+    def is_unchanged(self, values):
+        return bool(values["slug"]) and self.fingerprints.get(values["slug"]) == (values["fingerprint"], values["state"])
+
+    def category_for(self, nombre):
+        nombre = str(nombre or "").strip()
+        if not nombre:
+            return None
+        category = self.categories.get(nombre)
+        if category is None:
+            # pocas por import: create() mantiene slug y clausura vía signals
+            category = Category.objects.create(nombre=nombre)
+            self.categories[nombre] = category
+        return category
+
+    def fetch_images(self, rows, progress=None):
+        """Primera pasada: baja todas las imágenes antes de abrir la transacción.
+
+        También cuenta las filas de datos (``self.total_rows``). Las filas sin
+        cambios desde el último import no se descargan.
+        """
+        self.preload()
+        urls = set()
+        self.total_rows = 0
+        for idx, row in rows:
+            self.total_rows += 1
+            values = self.normalize_row(idx, row, errors=None)
+            if values is not None and values["imagen_url"] and not self.is_unchanged(values):
+                urls.add(values["imagen_url"])
+        fetcher = RemoteImageCache()
+        try:
+            self.images = fetcher.fetch_all((u for u in urls if is_remote(u)), progress=progress)
+        finally:
+            fetcher.close()
+        return self.images
+
+    def normalize_row(self, idx, row, errors=True):
+        """Valida una fila sin tocar la base; devuelve los valores normalizados (con huella) o ``None``."""
+        if all(v in ("", None) for v in row.values()):
+            return None
+        nombre = row.get("nombre") or ""
+        precio = parse_decimal(row.get("precio"))
+        if not nombre or precio is None:
+            if errors:
+                self.result.errors.append(f"Fila {idx}: nombre y precio son obligatorios.")
+            return None
+        stock = parse_int(row.get("stock"))
+        values = {
+            "idx": idx,
+            "slug": slugify(row.get("slug") or row.get("sku") or nombre)[:110],
+            "nombre": str(nombre),
+            "descripcion": row.get("descripcion") or "",
+            "precio": precio.quantize(Decimal("0.01")),
+            "stock": stock if stock is not None else 0,
+            "activo": parse_bool(row.get("activo"), default=True),
+            "categoria": str(row.get("categoria") or "").strip(),
+            "imagen_url": str(row.get("imagen_1") or "").strip(),
+        }
+        values["fingerprint"] = row_fingerprint(values)
+        values["state"] = row_fingerprint(values, STATE_FIELDS)
+        return values
+
+    def apply(self, product, data):
+        product.nombre = data["nombre"]
+        product.descripcion = data["descripcion"]
+        product.precio = data["precio"]
+        product.stock = data["stock"]
+        product.activo = data["activo"]
+        product.categoria = data["categoria"]
+        product.import_fingerprint = data["fingerprint"]
+        image = self.images.get(data["imagen_url"])
+        if image is not None:
+            if image.name:
+                product.imagen.name = image.name
+            else:
+                self.result.errors.append(f"Fila {data['idx']}: {image.error}")
+                # sin huella: el próximo import vuelve a intentar la imagen
+                product.import_fingerprint = ""
+
+    def write_chunk(self, rows):
+        """Escribe un lote; devuelve los pks tocados."""
+        now = timezone.now()
+        existing_slugs = {r["slug"] for r in rows if r["slug"] in self.slugs}
+        existing = Product.objects.in_bulk(existing_slugs, field_name="slug") if existing_slugs else {}
+        to_create = {}
+        to_update = {}
+        # nombres que no dan slug (solo símbolos): uno nuevo por fila, asignados en lote
+        generated = iter(self.slug_allocator.allocate([r["nombre"] for r in rows if not r["slug"]]))
+        for data in rows:
+            slug = data["slug"]
+            product = to_create.get(slug) or to_update.get(slug) or existing.get(slug)
+            if product is None:
+                if not slug:
+                    slug = next(generated)
+                product = Product(slug=slug, user=self.user)
+                to_create[slug] = product
+            elif product.pk is not None:
+                to_update[slug] = product
+            self.apply(product, data)
+            product.actualizado_en = now
+
+        ids = []
+        if to_create:
+            Product.objects.bulk_create(to_create.values(), batch_size=self.chunk_size)
+            if all(p.pk for p in to_create.values()):
+                created = [(p.slug, p.pk) for p in to_create.values()]
+            else:
+                # backends sin RETURNING
+                created = list(Product.objects.filter(slug__in=to_create).values_list("slug", "pk"))
+            self.slugs.update(created)
+            ids.extend(pk for _, pk in created)
+        if to_update:
+            Product.objects.bulk_update(to_update.values(), UPDATE_FIELDS, batch_size=self.chunk_size)
+            ids.extend(p.pk for p in to_update.values())
+        self.result.created += len(to_create)
+        self.result.updated += len(to_update)
+        return ids
+
+    def flush(self, rows):
+        if rows:
+            ids = self.write_chunk(rows)
+            refresh_effective_prices(ids)
+            index_products(ids)
+            self.changed = True
+
+    def run(self, rows, start_after=0, checkpoint=None):
+        """Importa ``rows`` (iterable de ``(idx, dict)``).
+
+        Sin ``checkpoint`` todo va en una transacción. Con ``checkpoint`` cada
+        lote se confirma por separado y ``checkpoint(filas_procesadas)`` corre
+        dentro de la misma transacción que el lote, así que el progreso
+        guardado nunca queda adelantado ni atrasado respecto de los datos.
+        Las primeras ``start_after`` filas de datos se saltean (reanudación).
+        """
+        self.preload()
+        self.changed = False
+        if checkpoint is None:
+            with transaction.atomic():
+                for chunk, _ in self.chunks(rows, start_after):
+                    self.flush(chunk)
+        else:
+            for chunk, processed in self.chunks(rows, start_after):
+                with transaction.atomic():
+                    self.flush(chunk)
+                    checkpoint(processed)
+                if chunk:
+                    versioning.bump(Product)
+        self.finish()
+        return self.result
+
+    def chunks(self, rows, start_after=0):
+        """Agrupa las filas a escribir de a ``chunk_size``; produce ``(lote, filas_procesadas)``.
+
+        También corta cada ``chunk_size`` filas leídas aunque el lote esté
+        incompleto (filas sin cambios), para que el checkpoint avance.
+        """
+        chunk = []
+        processed = start_after
+        read = 0
+        for idx, row in rows:
+            # idx es el número de fila de la hoja; la 1 son los encabezados
+            if idx - 1 <= start_after:
+                continue
+            processed = idx - 1
+            read += 1
+            data = self.prepare_row(idx, row)
+            if data is not None:
+                chunk.append(data)
+            if len(chunk) >= self.chunk_size or read >= self.chunk_size:
+                yield chunk, processed
+                chunk = []
+                read = 0
+        yield chunk, processed
+
+    def prepare_row(self, idx, row):
+        """Fila lista para ``write_chunk``; ``None`` si es inválida o igual al último import."""
+        values = self.normalize_row(idx, row)
+        if values is None:
+            return None
+        if self.is_unchanged(values):
+            self.result.unchanged += 1
+            return None
+        if values["slug"]:
+            # una fila repetida más abajo se compara contra esta, no contra la base
+            self.fingerprints[values["slug"]] = (values["fingerprint"], values["state"])
+        values["categoria"] = self.category_for(values["categoria"])
+        return values
+
+    def diff(self, rows, sample_size=DIFF_SAMPLE_SIZE):
+        """Simulación: qué haría el import, sin escribir nada (ni crear categorías).
+
+        Cuenta altas, modificaciones, filas sin cambios y productos activos que
+        no vienen en el archivo (``ausentes``, el import no los toca). Para una
+        muestra de modificaciones detalla los campos que cambian.
+        """
+        self.preload()
+        seen = set()
+        report = {"nuevos": 0, "modificados": 0, "sin_cambios": 0, "ausentes": 0}
+        samples = {"nuevos": [], "modificados": [], "ausentes": []}
+        changed = {}
+        self.total_rows = 0
+        for idx, row in rows:
+            self.total_rows += 1
+            values = self.normalize_row(idx, row)
+            if values is None:
+                continue
+            slug = values["slug"]
+            if slug in seen:
+                continue
+            seen.add(slug)
+            if slug not in self.slugs:
+                kind = "nuevos"
+            elif self.is_unchanged(values):
+                report["sin_cambios"] += 1
+                continue
+            else:
+                kind = "modificados"
+                if len(changed) < sample_size:
+                    changed[slug] = values
+            report[kind] += 1
+            if kind == "nuevos" and len(samples[kind]) < sample_size:
+                samples[kind].append({"fila": idx, "slug": slug, "nombre": values["nombre"]})
+
+        for slug, nombre in Product.objects.filter(activo=True).values_list("slug", "nombre").iterator():
+            if slug not in seen:
+                report["ausentes"] += 1
+                if len(samples["ausentes"]) < sample_size:
+                    samples["ausentes"].append({"slug": slug, "nombre": nombre})
+
+        products = Product.objects.select_related("categoria").in_bulk(list(changed), field_name="slug")
+        for slug, values in changed.items():
+            product = products.get(slug)
+            if product is not None:
+                samples["modificados"].append({
+                    "fila": values["idx"],
+                    "slug": slug,
+                    "cambios": self.field_changes(product, values),
+                })
+        report["errores"] = self.result.errors
+        report["muestras"] = samples
+        return report
+
+    def field_changes(self, product, values):
+        current = {
+            "nombre": product.nombre,
+            "descripcion": product.descripcion,
+            "precio": product.precio,
+            "stock": product.stock,
+            "activo": product.activo,
+            "categoria": product.categoria.nombre if product.categoria else "",
+        }
+        return {
+            field: [str(old), str(values[field])]
+            for field, old in current.items()
+            if str(old) != str(values[field])
+        }
+
+    def finish(self):
+        if self.changed:
+            versioning.bump(Product)
+
@@ -0,0 +1,113 @@
+from collections import OrderedDict
+from threading import Lock
+
+from django.db.models import Q
+
+from .models import Product
+
+SLUG_MAP_SIZE = 5000
+
+
+class SlugMap:
+    """Mapa slug -> id en memoria del proceso (LRU acotado).
+
+    No se invalida: quien lo usa verifica que el producto traído por id siga
+    teniendo ese slug y, si no, descarta la entrada y busca por slug.
+    """
+
+    def __init__(self, size=SLUG_MAP_SIZE):
+        self.size = size
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, slug):
+        with self._lock:
+            pk = self._data.get(slug)
+            if pk is not None:
+                self._data.move_to_end(slug)
+            return pk
+
+    def remember(self, products):
+        with self._lock:
+            for product in products:
+                if product.slug:
+                    self._data[product.slug] = product.pk
+                    self._data.move_to_end(product.slug)
+            while len(self._data) > self.size:
+                self._data.popitem(last=False)
+
+    def forget(self, slug):
+        with self._lock:
+            self._data.pop(slug, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+slug_map = SlugMap()
+
+
+MAX_ID = 2 ** 63 - 1
+
+
+def _as_id(value):
+    # isdecimal(): isdigit() acepta "²" o "١"; el rango evita OverflowError en SQLite
+    value = str(value).strip()
+    if not value.isascii() or not value.isdecimal():
+        return None
+    try:
+        pk = int(value)
+    except ValueError:
+        return None
+    return pk if pk <= MAX_ID else None
+
+
+def resolve_products(values, queryset=None):
+    """Resuelve una lista mixta de ids y slugs en una consulta.
+
+    Devuelve ``{valor: producto}`` solo con los encontrados. Los valores
+    numéricos se prueban como id y, si no existen, como slug (igual que
+    ``resolve_product``). Solo hace una segunda consulta si algún slug del mapa
+    quedó viejo.
+    """
+    qs = queryset if queryset is not None else Product.objects.select_related("categoria")
+    values = [str(v).strip() for v in values if v not in (None, "") and str(v).strip()]
+    ids, slugs = set(), set()
+    for value in values:
+        pk = _as_id(value)
+        if pk is None:
+            pk = slug_map.get(value)
+        if pk is not None:
+            ids.add(pk)
+        if _as_id(value) is not None or pk is None:
+            slugs.add(value)
+    if not values:
+        return {}
+
+    found = list(qs.filter(Q(pk__in=ids) | Q(slug__in=slugs)))
+    by_id = {p.pk: p for p in found}
+    by_slug = {p.slug: p for p in found}
+    result, stale = {}, []
+    for value in values:
+        pk = _as_id(value)
+        if pk is not None and pk in by_id:
+            result[value] = by_id[pk]
+        elif value in by_slug:
+            result[value] = by_slug[value]
+        elif pk is None and slug_map.get(value) is not None:
+            stale.append(value)
+    if stale:
+        for value in stale:
+            slug_map.forget(value)
+        extra = {p.slug: p for p in qs.filter(slug__in=stale)}
+        found.extend(extra.values())
+        result.update((value, extra[value]) for value in stale if value in extra)
+    slug_map.remember(found)
+    return result
+
+
+def resolve_product(value, queryset=None):
+    if value in (None, ""):
+        return None
+    return resolve_products([value], queryset).get(str(value).strip())
@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from cotidjango.snapshots import build_snapshot, snapshot_root
+from products.catalog import catalog_stamp
+
+
+class Command(BaseCommand):
+    help = "Genera el snapshot estatico (JSON + .gz) de los listados del catalogo y actualiza manifest.json."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--watch",
+            action="store_true",
+            help="Queda corriendo y regenera el snapshot cada vez que cambia el catálogo.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=30,
+            help="Segundos entre chequeos de cambios en modo --watch.",
+        )
+
+    def handle(self, *args, **options):
+        stamp = catalog_stamp()[0]
+        self._build()
+        if not options["watch"]:
+            return
+
+        interval = max(1, options["interval"])
+        while True:
+            time.sleep(interval)
+            # versiones de tabla compartidas + inicios/fines de oferta: ve escrituras de cualquier proceso
+            current = catalog_stamp()[0]
+            if current != stamp:
+                stamp = current
+                self._build()
+
+    def _build(self):
+        manifest = build_snapshot()
+        files = manifest["files"]
+        total = len(files["products"]) + sum(len(pages) for pages in files["categories"].values()) + 2
+        self.stdout.write(self.style.SUCCESS(
+            f"{timezone.now():%Y-%m-%d %H:%M:%S} snapshot v{manifest['version']}: "
+            f"{total} archivos en {snapshot_root() / ('v' + manifest['version'])}"
+        ))
@@ -0,0 +1,31 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+
+from cotidjango.images import build_all_derivatives, derivatives_root, presets, source_path
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = "Pre-genera los derivados (WebP/JPEG por preset) de las imagenes de productos."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Procesos en paralelo.")
+
+    def handle(self, *args, **options):
+        names = set(Product.objects.exclude(imagen="").exclude(imagen__isnull=True).values_list("imagen", flat=True))
+        sources = sorted({path for path in (source_path(name) for name in names) if path is not None})
+        self.stdout.write(f"Imagenes a procesar: {len(sources)} ({len(names) - len(sources)} sin archivo)")
+
+        root, widths = derivatives_root(), presets()
+        created = failed = 0
+        with ProcessPoolExecutor(max_workers=max(1, options["workers"])) as pool:
+            futures = {pool.submit(build_all_derivatives, path, root, widths): path for path in sources}
+            for future in as_completed(futures):
+                try:
+                    created += future.result()
+                except Exception as exc:
+                    failed += 1
+                    self.stderr.write(f"{futures[future]}: {exc}")
+        self.stdout.write(self.style.SUCCESS(f"Derivados generados: {created}, errores: {failed}"))
@@ -1,11 +1,18 @@
-from django.core.management.base import BaseCommand
-from django.utils.text import slugify
+import json
+import sys
 
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+
+from products.categories import sync_category_tree
 from products.models import Category
 
 
 class Command(BaseCommand):
-    help = "Importa las categorías definidas en Frontend/src/data/categorias.js al admin de Django."
+    help = (
+        "Sincroniza el árbol de categorías (JSON de cualquier profundidad, por archivo o stdin; "
+        "por defecto el de Frontend/src/data/categorias.js) con escrituras en bloque."
+    )
 
     FRONTEND_CATS = [
         {
@@ -40,47 +47,51 @@ class Command(BaseCommand):
     ]
 
     def add_arguments(self, parser):
+        parser.add_argument(
+            "path",
+            nargs="?",
+            help="Archivo JSON con el árbol de categorías ('-' para stdin). Sin archivo usa FRONTEND_CATS.",
+        )
         parser.add_argument(
             "--reset",
             action="store_true",
             help="Elimina categorías existentes antes de importar.",
         )
+        parser.add_argument("--dry-run", action="store_true", help="Solo muestra qué cambiaría.")
+
+    def load_tree(self, path):
+        if not path:
+            return self.FRONTEND_CATS
+        try:
+            if path == "-":
+                data = json.load(sys.stdin)
+            else:
+                with open(path, encoding="utf-8") as fh:
+                    data = json.load(fh)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f"No se pudo leer el árbol de categorías: {exc}")
+        if isinstance(data, dict):
+            # {"categorias": [...]} o un único nodo raíz
+            data = next((data[k] for k in ("categorias", "categories") if k in data), [data])
+        if not isinstance(data, list):
+            raise CommandError("El JSON tiene que ser una lista de categorías.")
+        return data
 
     def handle(self, *args, **options):
-        if options["reset"]:
-            Category.objects.all().delete()
+        tree = self.load_tree(options["path"])
+        reset = options["reset"] and not options["dry_run"]
+        try:
+            # el reset y la sincronización se confirman juntos: si falla el árbol no se borra nada
+            with transaction.atomic():
+                if reset:
+                    Category.objects.all().delete()
+                report = sync_category_tree(tree, dry_run=options["dry_run"])
+        except (ValueError, IntegrityError) as exc:
+            raise CommandError(str(exc))
+        if reset:
             self.stdout.write(self.style.WARNING("Categorías eliminadas (reset)."))
-
-        created, existing = 0, 0
-
-        def ensure_category(name, parent=None):
-            slug = slugify(name)
-            obj, was_created = Category.objects.get_or_create(
-                slug=slug,
-                defaults={"nombre": name, "parent": parent},
-            )
-            if not was_created and (obj.nombre != name or obj.parent != parent):
-                obj.nombre = name
-                obj.parent = parent
-                obj.save()
-            return obj, was_created
-
-        for cat in self.FRONTEND_CATS:
-            cat_obj, was_created = ensure_category(cat["nombre"])
-            created += int(was_created)
-            existing += int(not was_created)
-            for sub in cat.get("subcategorias", []):
-                if isinstance(sub, str):
-                    sub_obj, sub_created = ensure_category(sub, parent=cat_obj)
-                    created += int(sub_created)
-                    existing += int(not sub_created)
-                    continue
-                sub_obj, sub_created = ensure_category(sub["nombre"], parent=cat_obj)
-                created += int(sub_created)
-                existing += int(not sub_created)
-                for leaf in sub.get("hijos", []):
-                    leaf_obj, leaf_created = ensure_category(leaf, parent=sub_obj)
-                    created += int(leaf_created)
-                    existing += int(not leaf_created)
-
-        self.stdout.write(self.style.SUCCESS(f"Categorías importadas. Nuevas: {created}, existentes: {existing}"))
+        prefix = "Simulación" if options["dry_run"] else "Categorías importadas"
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}. Nuevas: {report['creadas']}, actualizadas: {report['actualizadas']}, "
+            f"sin cambios: {report['sin_cambios']}"
+        ))
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from products.import_jobs import claim_next_job, run_job
+
+
+class Command(BaseCommand):
+    help = "Procesa los imports de productos (XLSX/CSV) encolados desde el admin (retoma los que quedaron a medias)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Procesa lo pendiente y termina.")
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=5,
+            help="Segundos de espera entre chequeos cuando no hay jobs.",
+        )
+        parser.add_argument("--chunk-size", type=int, default=None, help="Filas por lote (y por checkpoint).")
+
+    def handle(self, *args, **options):
+        interval = max(1, options["interval"])
+        while True:
+            job = claim_next_job()
+            if job is None:
+                if options["once"]:
+                    return
+                time.sleep(interval)
+                continue
+            self.stdout.write(f"{timezone.now():%Y-%m-%d %H:%M:%S} import {job.pk}: {job.nombre_archivo}")
+            job = run_job(job, chunk_size=options["chunk_size"])
+            if job is not None:
+                self.stdout.write(
+                    f"  {job.get_estado_display()}: {job.creados} nuevos, {job.actualizados} actualizados, "
+                    f"{job.total_errores} errores"
+                )
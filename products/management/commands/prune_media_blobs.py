@@ -0,0 +1,59 @@
+import os
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from cotidjango.storage import CONTENT_PREFIX, is_content_addressed
+from products.models import Product, product_image_storage
+
+
+class Command(BaseCommand):
+    help = "Borra los blobs direccionados por contenido (media/uploads/) que ningun producto ni avatar referencia."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Solo lista lo que se borraria.")
+        parser.add_argument(
+            "--min-age",
+            type=int,
+            default=24 * 3600,
+            help="Segundos desde la ultima escritura: los blobs mas nuevos pueden ser de uploads en curso.",
+        )
+
+    def handle(self, *args, **options):
+        storage = product_image_storage()
+        referenced = set(Product.objects.exclude(imagen="").exclude(imagen__isnull=True).values_list("imagen", flat=True))
+        referenced |= set(
+            get_user_model().objects.exclude(avatar="").exclude(avatar__isnull=True).values_list("avatar", flat=True)
+        )
+        cutoff = time.time() - max(0, options["min_age"])
+        removed = kept = freed = 0
+        for directory in (CONTENT_PREFIX, ".incoming"):
+            root = storage.path(directory)
+            for dirpath, _dirnames, filenames in os.walk(root):
+                for filename in filenames:
+                    path = os.path.join(dirpath, filename)
+                    name = os.path.relpath(path, storage.location).replace(os.sep, "/")
+                    if directory == CONTENT_PREFIX and (not is_content_addressed(name) or name in referenced):
+                        kept += 1
+                        continue
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    if stat.st_mtime > cutoff:
+                        kept += 1
+                        continue
+                    removed += 1
+                    freed += stat.st_size
+                    if options["dry_run"]:
+                        self.stdout.write(name)
+                    else:
+                        try:
+                            os.unlink(path)
+                        except FileNotFoundError:
+                            pass
+        verb = "Se borrarian" if options["dry_run"] else "Borrados"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {removed} blobs sin referencias ({freed / (1024 * 1024):.1f} MB); conservados: {kept}"
+        ))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from products.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = "Reconstruye el índice FTS5 de búsqueda de productos (solo SQLite)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default="default")
+
+    def handle(self, *args, **options):
+        if rebuild_search_index(options["database"]):
+            self.stdout.write(self.style.SUCCESS("Índice de búsqueda reconstruido."))
+        else:
+            self.stdout.write(self.style.WARNING("FTS5 no disponible: se usa búsqueda por LIKE."))
@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from products.models import Product
+from products.pricing import next_price_boundary, refresh_effective_prices, refresh_stale_prices
+
+
+class Command(BaseCommand):
+    help = "Recalcula los precios efectivos cuando empieza o termina una oferta."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="Recalcula todo el catálogo.")
+        parser.add_argument(
+            "--watch",
+            action="store_true",
+            help="Queda corriendo y recalcula cada vez que vence la ventana de una oferta.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=60,
+            help="Espera máxima (segundos) entre chequeos en modo --watch.",
+        )
+
+    def handle(self, *args, **options):
+        if options["all"]:
+            total = refresh_effective_prices()
+            self.stdout.write(self.style.SUCCESS(f"Precios recalculados: {total}"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Precios recalculados: {self._refresh()}"))
+        if not options["watch"]:
+            return
+
+        interval = max(1, options["interval"])
+        while True:
+            boundary = next_price_boundary()
+            wait = interval
+            if boundary:
+                wait = min(interval, max(0.0, (boundary - timezone.now()).total_seconds()))
+            time.sleep(wait)
+            total = self._refresh()
+            if total:
+                self.stdout.write(f"{timezone.now():%Y-%m-%d %H:%M:%S} precios recalculados: {total}")
+
+    def _refresh(self):
+        total = refresh_stale_prices()
+        # productos creados por fuera del ORM (bulk, SQL) sin precio calculado
+        missing = list(Product.objects.filter(precio_efectivo__isnull=True).values_list("pk", flat=True))
+        if missing:
+            total += refresh_effective_prices(missing)
+        return total
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.8 on 2026-10-16 20:37
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def seed_effective_prices(apps, schema_editor):
+    # Filas provisorias marcadas como vencidas: `refresh_prices` (o la primera
+    # consulta por precio) las recalcula con las ofertas vigentes.
+    Product = apps.get_model("products", "Product")
+    EffectivePrice = apps.get_model("products", "EffectivePrice")
+    now = django.utils.timezone.now()
+    rows = [
+        EffectivePrice(product_id=pk, precio_final=precio, vigente_desde=now, vigente_hasta=now)
+        for pk, precio in Product.objects.values_list("pk", "precio").iterator()
+    ]
+    EffectivePrice.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0006_alter_offer_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EffectivePrice',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='precio_efectivo', serialize=False, to='products.product')),
+                ('precio_final', models.DecimalField(db_index=True, decimal_places=2, max_digits=10)),
+                ('porcentaje', models.DecimalField(decimal_places=2, default=0, max_digits=5)),
+                ('vigente_desde', models.DateTimeField(default=django.utils.timezone.now)),
+                ('vigente_hasta', models.DateTimeField(blank=True, db_index=True, null=True)),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+                ('oferta', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='products.offer')),
+            ],
+            options={
+                'verbose_name': 'Precio efectivo',
+                'verbose_name_plural': 'Precios efectivos',
+            },
+        ),
+        migrations.RunPython(seed_effective_prices, migrations.RunPython.noop),
+    ]
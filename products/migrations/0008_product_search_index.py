@@ -0,0 +1,28 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    from products.search import install_search_index
+
+    install_search_index(schema_editor.connection, populate=True)
+
+
+def drop_search_index(apps, schema_editor):
+    from products.search import drop_search_triggers
+
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    drop_search_triggers(schema_editor.connection)
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("DROP TABLE IF EXISTS products_product_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0007_effective_price"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
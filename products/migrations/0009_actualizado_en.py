@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-16 20:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0008_product_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='offer',
+            name='actualizado_en',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='actualizado_en',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.8 on 2026-10-16 20:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_closure(apps, schema_editor):
+    Category = apps.get_model("products", "Category")
+    CategoryClosure = apps.get_model("products", "CategoryClosure")
+    parents = dict(Category.objects.values_list("id", "parent_id"))
+    rows = []
+    for node_id in parents:
+        rows.append(CategoryClosure(ancestor_id=node_id, descendant_id=node_id, depth=0))
+        seen = {node_id}
+        parent_id, depth = parents.get(node_id), 1
+        while parent_id and parent_id in parents and parent_id not in seen:
+            rows.append(CategoryClosure(ancestor_id=parent_id, descendant_id=node_id, depth=depth))
+            seen.add(parent_id)
+            parent_id, depth = parents.get(parent_id), depth + 1
+    CategoryClosure.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0009_actualizado_en'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveSmallIntegerField(default=0)),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='products.category')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='products.category')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['descendant', 'depth'], name='products_ca_descend_c38652_idx')],
+                'constraints': [models.UniqueConstraint(fields=('ancestor', 'descendant'), name='unique_category_closure')],
+            },
+        ),
+        migrations.RunPython(build_closure, migrations.RunPython.noop),
+    ]
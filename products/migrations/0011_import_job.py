@@ -0,0 +1,45 @@
+# Generated by Django 5.2.8 on 2026-10-16 20:59
+
+import django.db.models.deletion
+import products.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0010_category_closure'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('archivo', models.FileField(storage=products.models.import_job_storage, upload_to='%Y/%m/')),
+                ('nombre_archivo', models.CharField(blank=True, max_length=255)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('descargando', 'Descargando imágenes'), ('importando', 'Importando'), ('completado', 'Completado'), ('error', 'Error')], db_index=True, default='pendiente', max_length=20)),
+                ('filas_total', models.PositiveIntegerField(blank=True, null=True)),
+                ('filas_procesadas', models.PositiveIntegerField(default=0)),
+                ('creados', models.PositiveIntegerField(default=0)),
+                ('actualizados', models.PositiveIntegerField(default=0)),
+                ('errores', models.JSONField(blank=True, default=list)),
+                ('total_errores', models.PositiveIntegerField(default=0)),
+                ('mensaje', models.TextField(blank=True)),
+                ('intentos', models.PositiveSmallIntegerField(default=0)),
+                ('worker', models.CharField(blank=True, max_length=120)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('iniciado_en', models.DateTimeField(blank=True, null=True)),
+                ('terminado_en', models.DateTimeField(blank=True, null=True)),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='import_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Importación',
+                'verbose_name_plural': 'Importaciones',
+                'ordering': ['-creado_en'],
+            },
+        ),
+    ]
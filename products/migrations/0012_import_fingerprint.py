@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-16 21:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0011_import_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='resumen',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='simulacion',
+            field=models.BooleanField(default=False, help_text='Solo calcula las diferencias, no escribe.'),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='sin_cambios',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='import_fingerprint',
+            field=models.CharField(blank=True, editable=False, max_length=40),
+        ),
+    ]
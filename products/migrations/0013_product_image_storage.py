@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-16 22:23
+
+import products.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0012_import_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='product',
+            name='imagen',
+            field=models.ImageField(blank=True, null=True, storage=products.models.product_image_storage, upload_to='products/'),
+        ),
+    ]
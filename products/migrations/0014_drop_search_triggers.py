@@ -0,0 +1,19 @@
+from django.db import migrations
+
+
+def drop_triggers(apps, schema_editor):
+    from products.search import drop_search_triggers
+
+    # el índice ahora lo mantiene la aplicación (products.search.index_products)
+    drop_search_triggers(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0013_product_image_storage"),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_triggers, migrations.RunPython.noop),
+    ]
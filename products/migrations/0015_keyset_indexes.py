@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-16 22:36
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0014_drop_search_triggers'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='offer',
+            index=models.Index(fields=['creado_en', 'id'], name='products_of_creado__ad15a2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='offer',
+            index=models.Index(fields=['porcentaje', 'id'], name='products_of_porcent_740837_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['creado_en', 'id'], name='products_pr_creado__f488cf_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.8 on 2026-10-16 22:41
+
+import cotidjango.storage
+import products.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0015_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='product',
+            name='imagen',
+            field=models.ImageField(blank=True, null=True, storage=products.models.product_image_storage, upload_to='products/', validators=[cotidjango.storage.validate_upload]),
+        ),
+    ]
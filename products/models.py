@@ -1,8 +1,20 @@
+from pathlib import Path
+
 from django.conf import settings
+from django.core.files.storage import FileSystemStorage
 from django.db import models
 from django.utils import timezone
 from django.utils.text import slugify
 
+from cotidjango.storage import ContentAddressedStorage, validate_upload
+
+from .slugs import save_with_unique_slug
+
+
+def product_image_storage():
+    """Imágenes de productos: direccionadas por contenido y solo formatos de imagen."""
+    return ContentAddressedStorage()
+
 
 class Category(models.Model):
     nombre = models.CharField(max_length=100, unique=True)
@@ -30,6 +42,23 @@ class Category(models.Model):
         return self.nombre
 
 
+class CategoryClosure(models.Model):
+    """Pares ancestro/descendiente del árbol de categorías (incluye depth=0 consigo misma)."""
+
+    ancestor = models.ForeignKey(Category, on_delete=models.CASCADE, related_name="descendant_links")
+    descendant = models.ForeignKey(Category, on_delete=models.CASCADE, related_name="ancestor_links")
+    depth = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["ancestor", "descendant"], name="unique_category_closure"),
+        ]
+        indexes = [models.Index(fields=["descendant", "depth"])]
+
+    def __str__(self):
+        return f"{self.ancestor_id} > {self.descendant_id} ({self.depth})"
+
+
 class Product(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="products")
     categoria = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, related_name="products")
@@ -37,26 +66,35 @@ class Product(models.Model):
     slug = models.SlugField(max_length=120, unique=True, blank=True)
     precio = models.DecimalField(max_digits=10, decimal_places=2)
     descripcion = models.TextField(blank=True)
-    imagen = models.ImageField(upload_to="products/", blank=True, null=True)
+    imagen = models.ImageField(
+        upload_to="products/", storage=product_image_storage, validators=[validate_upload], blank=True, null=True
+    )
     stock = models.PositiveIntegerField(default=0)
     activo = models.BooleanField(default=True)
     creado_en = models.DateTimeField(auto_now_add=True)
+    actualizado_en = models.DateTimeField(auto_now=True, db_index=True)
+    # huella de la última fila importada; save() la borra y el import además compara
+    # los campos contra la base, así que los queryset.update() también cuentan como cambio
+    import_fingerprint = models.CharField(max_length=40, blank=True, editable=False)
 
     class Meta:
         ordering = ["-creado_en"]
+        # paginación keyset (cotidjango.pagination): ORDER BY/WHERE por (creado_en, id) con SEARCH sobre el índice
+        indexes = [models.Index(fields=["creado_en", "id"])]
 
     def __str__(self) -> str:
         return self.nombre
 
     def save(self, *args, **kwargs):
+        if self.import_fingerprint:
+            self.import_fingerprint = ""
+            if kwargs.get("update_fields") is not None:
+                kwargs["update_fields"] = {*kwargs["update_fields"], "import_fingerprint"}
         if not self.slug and self.nombre:
-            base = slugify(self.nombre)[:110]
-            candidate = base
-            i = 1
-            while Product.objects.filter(slug=candidate).exclude(pk=self.pk).exists():
-                i += 1
-                candidate = f"{base}-{i}"
-            self.slug = candidate
+            return save_with_unique_slug(
+                self, self.nombre, lambda: super(Product, self).save(*args, **kwargs),
+                base_length=110, default="producto",
+            )
         super().save(*args, **kwargs)
 
 
@@ -71,13 +109,18 @@ class Offer(models.Model):
     empieza = models.DateTimeField(null=True, blank=True)
     termina = models.DateTimeField(null=True, blank=True)
     creado_en = models.DateTimeField(auto_now_add=True)
+    actualizado_en = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         ordering = ["-creado_en"]
+        indexes = [models.Index(fields=["creado_en", "id"]), models.Index(fields=["porcentaje", "id"])]
 
     def save(self, *args, **kwargs):
         if not self.slug:
-            self.slug = slugify(self.nombre)[:130]
+            return save_with_unique_slug(
+                self, self.nombre, lambda: super(Offer, self).save(*args, **kwargs),
+                base_length=130, default="oferta",
+            )
         super().save(*args, **kwargs)
 
     @property
@@ -90,3 +133,85 @@ class Offer(models.Model):
         if self.termina and now > self.termina:
             return False
         return True
+
+
+class EffectivePrice(models.Model):
+    """Precio final vigente de cada producto (desnormalizado para filtrar y ordenar en SQL)."""
+
+    product = models.OneToOneField(
+        Product, on_delete=models.CASCADE, primary_key=True, related_name="precio_efectivo"
+    )
+    precio_final = models.DecimalField(max_digits=10, decimal_places=2, db_index=True)
+    porcentaje = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+    oferta = models.ForeignKey(Offer, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    vigente_desde = models.DateTimeField(default=timezone.now)
+    vigente_hasta = models.DateTimeField(null=True, blank=True, db_index=True)
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Precio efectivo"
+        verbose_name_plural = "Precios efectivos"
+
+    def __str__(self):
+        return f"{self.product_id}: {self.precio_final}"
+
+
+def import_job_storage():
+    """Los archivos de import no son imágenes ni públicos: quedan fuera de MEDIA_ROOT."""
+    return FileSystemStorage(location=getattr(settings, "IMPORT_JOBS_ROOT", Path(settings.BASE_DIR) / "private" / "imports"))
+
+
+class ImportJob(models.Model):
+    """Import de productos (XLSX/CSV) encolado desde el admin y procesado por ``process_import_jobs``.
+
+    ``filas_procesadas`` es el checkpoint: cantidad de filas de datos cuyo lote
+    ya quedó escrito (en la misma transacción que el lote). Un worker que
+    retoma el job saltea esas filas.
+    """
+
+    PENDIENTE = "pendiente"
+    DESCARGANDO = "descargando"
+    IMPORTANDO = "importando"
+    COMPLETADO = "completado"
+    ERROR = "error"
+    ESTADOS = [
+        (PENDIENTE, "Pendiente"),
+        (DESCARGANDO, "Descargando imágenes"),
+        (IMPORTANDO, "Importando"),
+        (COMPLETADO, "Completado"),
+        (ERROR, "Error"),
+    ]
+    EN_CURSO = (DESCARGANDO, IMPORTANDO)
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="import_jobs")
+    archivo = models.FileField(upload_to="%Y/%m/", storage=import_job_storage)
+    nombre_archivo = models.CharField(max_length=255, blank=True)
+    simulacion = models.BooleanField(default=False, help_text="Solo calcula las diferencias, no escribe.")
+    resumen = models.JSONField(null=True, blank=True)
+    estado = models.CharField(max_length=20, choices=ESTADOS, default=PENDIENTE, db_index=True)
+    filas_total = models.PositiveIntegerField(null=True, blank=True)
+    filas_procesadas = models.PositiveIntegerField(default=0)
+    creados = models.PositiveIntegerField(default=0)
+    actualizados = models.PositiveIntegerField(default=0)
+    sin_cambios = models.PositiveIntegerField(default=0)
+    errores = models.JSONField(default=list, blank=True)
+    total_errores = models.PositiveIntegerField(default=0)
+    mensaje = models.TextField(blank=True)
+    intentos = models.PositiveSmallIntegerField(default=0)
+    worker = models.CharField(max_length=120, blank=True)
+    creado_en = models.DateTimeField(auto_now_add=True)
+    iniciado_en = models.DateTimeField(null=True, blank=True)
+    terminado_en = models.DateTimeField(null=True, blank=True)
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-creado_en"]
+        verbose_name = "Importación"
+        verbose_name_plural = "Importaciones"
+
+    def __str__(self):
+        return f"{self.nombre_archivo or self.archivo.name} ({self.get_estado_display()})"
+
+    @property
+    def terminado(self):
+        return self.estado in (self.COMPLETADO, self.ERROR)
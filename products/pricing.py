@@ -0,0 +1,210 @@
+from decimal import Decimal
+
+from django.db.models import F, Q
+from django.utils import timezone
+
+from cotidjango import versioning
+
+from .models import EffectivePrice, Offer, Product
+
+REFRESH_CHUNK_SIZE = 500
+
+
+def active_offers(now=None):
+    now = now or timezone.now()
+    return Offer.objects.filter(activo=True).filter(
+        Q(empieza__isnull=True) | Q(empieza__lte=now),
+        Q(termina__isnull=True) | Q(termina__gte=now),
+    )
+
+
+def build_discount(product, offer):
+    pct = offer.porcentaje or Decimal("0")
+    final_price = product.precio * (Decimal("1.00") - (pct / Decimal("100")))
+    if final_price < 0:
+        final_price = Decimal("0.00")
+    return {
+        "final_price": final_price,
+        "meta": {
+            "percent": float(pct),
+            "label": f"-{pct}%",
+            "offerId": offer.id,
+            "offerSlug": offer.slug,
+        },
+    }
+
+
+def best_offers(products, now=None):
+    """Devuelve {product_id: Offer} con la mejor oferta vigente de cada producto.
+
+    Carga en una sola consulta todas las ofertas vigentes que apuntan a los
+    productos o a sus categorías y elige la de mayor porcentaje en memoria.
+    """
+    products = [p for p in products if p is not None and p.pk is not None]
+    if not products:
+        return {}
+    product_ids = {p.pk for p in products}
+    category_ids = {p.categoria_id for p in products if p.categoria_id}
+    lookup = Q(producto_id__in=product_ids)
+    if category_ids:
+        lookup |= Q(categoria_id__in=category_ids)
+    offers = active_offers(now).filter(lookup).order_by("-porcentaje", "-creado_en", "-id")
+
+    by_product = {}
+    by_category = {}
+    for offer in offers:
+        # las ofertas vienen ordenadas: la primera de cada clave es la mejor
+        if offer.producto_id:
+            by_product.setdefault(offer.producto_id, offer)
+        if offer.categoria_id:
+            by_category.setdefault(offer.categoria_id, offer)
+
+    result = {}
+    for product in products:
+        candidates = [
+            o for o in (by_product.get(product.pk), by_category.get(product.categoria_id)) if o is not None
+        ]
+        if candidates:
+            result[product.pk] = max(candidates, key=lambda o: o.porcentaje or Decimal("0"))
+    return result
+
+
+def resolve_discounts(products, now=None):
+    """Versión por lotes de ``resolve_discount_for_product``: {product_id: discount}."""
+    products = [p for p in products if p is not None]
+    offers = best_offers(products, now=now)
+    return {p.pk: build_discount(p, offers[p.pk]) for p in products if p.pk in offers}
+
+
+def parse_price(value):
+    if value in (None, ""):
+        return None
+    try:
+        price = Decimal(str(value).replace(",", "."))
+    except Exception:
+        return None
+    return price if price.is_finite() else None
+
+
+def filter_by_price(qs, min_price=None, max_price=None):
+    """Filtra por precio efectivo (con descuentos) usando la tabla materializada."""
+    if min_price is not None:
+        qs = qs.filter(precio_efectivo__precio_final__gte=min_price)
+    if max_price is not None:
+        qs = qs.filter(precio_efectivo__precio_final__lte=max_price)
+    return qs
+
+
+def _upcoming_starts(products, now):
+    """{product_id: datetime} con el próximo inicio de oferta que afecta a cada producto."""
+    product_ids = {p.pk for p in products}
+    category_ids = {p.categoria_id for p in products if p.categoria_id}
+    lookup = Q(producto_id__in=product_ids)
+    if category_ids:
+        lookup |= Q(categoria_id__in=category_ids)
+    upcoming = (
+        Offer.objects.filter(activo=True, empieza__gt=now)
+        .filter(Q(termina__isnull=True) | Q(termina__gt=F("empieza")))
+        .filter(lookup)
+        .values_list("producto_id", "categoria_id", "empieza")
+    )
+    by_product, by_category = {}, {}
+    for producto_id, categoria_id, empieza in upcoming:
+        for bucket, key in ((by_product, producto_id), (by_category, categoria_id)):
+            if key and (key not in bucket or empieza < bucket[key]):
+                bucket[key] = empieza
+    result = {}
+    for product in products:
+        starts = [d for d in (by_product.get(product.pk), by_category.get(product.categoria_id)) if d]
+        if starts:
+            result[product.pk] = min(starts)
+    return result
+
+
+def _refresh_chunk(products, now):
+    if not products:
+        return 0
+    offers = best_offers(products, now=now)
+    upcoming = _upcoming_starts(products, now)
+    rows = []
+    for product in products:
+        offer = offers.get(product.pk)
+        boundaries = [d for d in (upcoming.get(product.pk), offer.termina if offer else None) if d]
+        rows.append(EffectivePrice(
+            product=product,
+            precio_final=build_discount(product, offer)["final_price"] if offer else product.precio,
+            porcentaje=offer.porcentaje if offer else Decimal("0"),
+            oferta=offer,
+            vigente_desde=now,
+            vigente_hasta=min(boundaries) if boundaries else None,
+            actualizado_en=now,
+        ))
+    EffectivePrice.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=["product"],
+        update_fields=["precio_final", "porcentaje", "oferta", "vigente_desde", "vigente_hasta", "actualizado_en"],
+    )
+    versioning.bump(EffectivePrice)
+    return len(rows)
+
+
+def refresh_effective_prices(product_ids=None, now=None):
+    """Recalcula ``EffectivePrice`` para los productos indicados (o todo el catálogo)."""
+    now = now or timezone.now()
+    qs = Product.objects.only("pk", "precio", "categoria_id").order_by("pk")
+    if product_ids is not None:
+        product_ids = {pk for pk in product_ids if pk is not None}
+        if not product_ids:
+            return 0
+        qs = qs.filter(pk__in=product_ids)
+    total = 0
+    chunk = []
+    for product in qs.iterator(chunk_size=REFRESH_CHUNK_SIZE):
+        chunk.append(product)
+        if len(chunk) >= REFRESH_CHUNK_SIZE:
+            total += _refresh_chunk(chunk, now)
+            chunk = []
+    total += _refresh_chunk(chunk, now)
+    return total
+
+
+def refresh_stale_prices(now=None):
+    """Recalcula los precios cuya ventana de vigencia ya venció."""
+    now = now or timezone.now()
+    stale = list(
+        EffectivePrice.objects.filter(vigente_hasta__lte=now).values_list("product_id", flat=True)
+    )
+    if not stale:
+        return 0
+    return refresh_effective_prices(stale, now=now)
+
+
+def refresh_prices_for_categories(category_ids, now=None):
+    category_ids = [pk for pk in category_ids if pk is not None]
+    if not category_ids:
+        return 0
+    ids = Product.objects.filter(categoria_id__in=category_ids).values_list("pk", flat=True)
+    return refresh_effective_prices(list(ids), now=now)
+
+
+def refresh_prices_for_offers(offers, now=None):
+    """Recalcula los productos alcanzados por las ofertas (o que hoy las tienen aplicadas)."""
+    offers = list(offers)
+    product_ids = {o.producto_id for o in offers if o.producto_id}
+    category_ids = {o.categoria_id for o in offers if o.categoria_id}
+    offer_ids = [o.pk for o in offers if o.pk]
+    if category_ids:
+        product_ids.update(Product.objects.filter(categoria_id__in=category_ids).values_list("pk", flat=True))
+    if offer_ids:
+        product_ids.update(EffectivePrice.objects.filter(oferta_id__in=offer_ids).values_list("product_id", flat=True))
+    return refresh_effective_prices(product_ids, now=now)
+
+
+def next_price_boundary():
+    return (
+        EffectivePrice.objects.filter(vigente_hasta__isnull=False)
+        .order_by("vigente_hasta")
+        .values_list("vigente_hasta", flat=True)
+        .first()
+    )
@@ -0,0 +1,117 @@
+"""Descarga concurrente de imágenes remotas con cache en disco por URL.
+
+Cada URL guarda en ``IMPORT_IMAGE_CACHE_DIR/<sha1(url)>.json`` el ETag, el
+Last-Modified y el nombre del archivo en el storage. En la próxima corrida se
+pide con ``If-None-Match``/``If-Modified-Since`` y un 304 reutiliza el archivo
+sin volver a bajarlo.
+"""
+import hashlib
+import json
+import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from os.path import basename
+from pathlib import Path
+from urllib.parse import urlparse
+
+import requests
+from django.conf import settings
+from django.core.files.base import ContentFile
+from requests.adapters import HTTPAdapter
+
+from cotidjango.storage import UploadRejected, max_upload_size
+
+from .models import product_image_storage
+
+FetchResult = namedtuple("FetchResult", ["name", "error", "cached"])
+
+
+def is_remote(url):
+    return str(url or "").startswith(("http://", "https://"))
+
+
+class RemoteImageCache:
+    def __init__(self, directory=None, workers=None, timeout=8):
+        self.directory = Path(directory or getattr(
+            settings, "IMPORT_IMAGE_CACHE_DIR", Path(settings.BASE_DIR) / ".cache" / "import-images"
+        ))
+        self.workers = workers or getattr(settings, "IMPORT_IMAGE_WORKERS", 8)
+        self.timeout = timeout
+        self.storage = product_image_storage()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.workers, pool_maxsize=self.workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _meta_path(self, url):
+        return self.directory / f"{hashlib.sha1(url.encode('utf-8')).hexdigest()}.json"
+
+    def _load_meta(self, url):
+        try:
+            meta = json.loads(self._meta_path(url).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if meta.get("url") != url or not meta.get("name") or not self.storage.exists(meta["name"]):
+            return None
+        return meta
+
+    def _store_meta(self, url, meta):
+        path = self._meta_path(url)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{os.getpid()}")
+        tmp.write_text(json.dumps({"url": url, **meta}), encoding="utf-8")
+        os.replace(tmp, path)
+
+    def _read_body(self, resp):
+        limit = max_upload_size()
+        body = bytearray()
+        for block in resp.iter_content(64 * 1024):
+            body.extend(block)
+            if len(body) > limit:
+                raise UploadRejected("imagen demasiado grande")
+        return bytes(body)
+
+    def fetch(self, url):
+        meta = self._load_meta(url)
+        headers = {}
+        if meta:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+        try:
+            with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as resp:
+                if resp.status_code == 304 and meta:
+                    return FetchResult(meta["name"], None, True)
+                if resp.status_code != 200:
+                    return FetchResult(None, f"no se pudo descargar imagen ({resp.status_code}).", False)
+                body = self._read_body(resp)
+                filename = basename(urlparse(url).path) or "imagen.jpg"
+                name = self.storage.save(f"products/{filename}", ContentFile(body))
+                self._store_meta(url, {
+                    "name": name,
+                    "etag": resp.headers.get("ETag"),
+                    "last_modified": resp.headers.get("Last-Modified"),
+                })
+                return FetchResult(name, None, False)
+        except Exception as exc:
+            return FetchResult(None, f"error descargando imagen ({exc}).", False)
+
+    def fetch_all(self, urls, progress=None):
+        """Descarga en paralelo; devuelve ``{url: FetchResult}``.
+
+        ``progress(hechas, total)`` se llama a medida que terminan las descargas.
+        """
+        urls = list(dict.fromkeys(u for u in urls if is_remote(u)))
+        if not urls:
+            return {}
+        results = {}
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(urls))) as pool:
+            for url, result in zip(urls, pool.map(self.fetch, urls)):
+                results[url] = result
+                if progress is not None:
+                    progress(len(results), len(urls))
+        return results
+
+    def close(self):
+        self.session.close()
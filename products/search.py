@@ -0,0 +1,142 @@
+import re
+import unicodedata
+
+from django.db import connections
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from django.utils.text import slugify
+
+FTS_TABLE = "products_product_fts"
+
+# Índice FTS5 mantenido desde la aplicación con ``index_products``: signals de
+# Product/Category y llamadas explícitas en las escrituras en bloque (import,
+# sync de categorías), igual que ``refresh_effective_prices``. Sin triggers: uno
+# que referencie products_category impide a SQLite reconstruir las tablas en
+# cualquier AddField/AlterField posterior.
+# `remove_diacritics 2` pliega acentos ("Decoración" == "decoracion", "Piñatas" == "pinatas").
+TABLE_SQL = f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        nombre, descripcion, slug, categoria,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+"""
+
+# triggers de versiones anteriores; los quita la migración 0014
+LEGACY_TRIGGERS = (
+    "products_product_fts_ai",
+    "products_product_fts_ad",
+    "products_product_fts_au",
+    "products_category_fts_au",
+)
+
+INSERT_SQL = f"""
+    INSERT INTO {FTS_TABLE}(rowid, nombre, descripcion, slug, categoria)
+    SELECT p.id, p.nombre, p.descripcion, p.slug, COALESCE(c.nombre, '')
+    FROM products_product p LEFT JOIN products_category c ON c.id = p.categoria_id
+"""
+
+REBUILD_SQL = [f"DELETE FROM {FTS_TABLE}", INSERT_SQL]
+
+INDEX_BATCH_SIZE = 500
+
+# pesos bm25 por columna: nombre, descripcion, slug, categoria
+RANK_SQL = f"bm25({FTS_TABLE}, 10.0, 1.0, 4.0, 3.0)"
+
+_enabled = {}
+
+
+def fold(text):
+    normalized = unicodedata.normalize("NFKD", str(text or ""))
+    return "".join(ch for ch in normalized if not unicodedata.combining(ch)).lower()
+
+
+def build_match(q):
+    """Convierte la búsqueda del usuario en una expresión MATCH segura (prefijos, AND implícito)."""
+    terms = re.findall(r"\w+", fold(q))
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def install_search_index(connection, populate=False):
+    """Crea la tabla FTS5 si la base es SQLite con FTS5. Devuelve si quedó habilitado."""
+    if connection.vendor != "sqlite":
+        return False
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(TABLE_SQL)
+            if populate:
+                for sql in REBUILD_SQL:
+                    cursor.execute(sql)
+    except Exception:
+        # SQLite compilado sin FTS5: queda la búsqueda por LIKE
+        return False
+    _enabled.pop(connection.alias, None)
+    return True
+
+
+def drop_search_triggers(connection):
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        for trigger in LEGACY_TRIGGERS:
+            cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+
+
+def rebuild_search_index(using="default"):
+    return install_search_index(connections[using], populate=True)
+
+
+def index_products(product_ids, using="default"):
+    """Vuelve a indexar ``product_ids``: borra sus filas y las reinserta desde la base.
+
+    Sirve para altas, cambios y bajas (un id que ya no existe solo se borra).
+    Corre en la transacción del llamador, así que el índice nunca queda
+    adelantado respecto de los datos.
+    """
+    ids = sorted({int(pk) for pk in product_ids if pk is not None})
+    if not ids or not fts_enabled(using):
+        return
+    with connections[using].cursor() as cursor:
+        for start in range(0, len(ids), INDEX_BATCH_SIZE):
+            batch = ids[start:start + INDEX_BATCH_SIZE]
+            marks = ", ".join(["%s"] * len(batch))
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({marks})", batch)
+            cursor.execute(f"{INSERT_SQL} WHERE p.id IN ({marks})", batch)
+
+
+def fts_enabled(using="default"):
+    if using not in _enabled:
+        connection = connections[using]
+        _enabled[using] = (
+            connection.vendor == "sqlite" and FTS_TABLE in connection.introspection.table_names()
+        )
+    return _enabled[using]
+
+
+def search_products(qs, q, using="default"):
+    """Filtra ``qs`` por texto y anota ``search_rank`` (menor es más relevante).
+
+    Usa el índice FTS5 cuando está disponible; si no, cae a ``icontains`` sobre
+    los mismos campos con ``search_rank`` constante.
+    """
+    q = (q or "").strip()
+    if not q:
+        return qs.annotate(search_rank=Value(0.0, output_field=FloatField()))
+    if fts_enabled(using):
+        match = build_match(q)
+        if not match:
+            return qs.none().annotate(search_rank=Value(0.0, output_field=FloatField()))
+        table = qs.model._meta.db_table
+        qs = qs.filter(
+            pk__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", (match,))
+        )
+        return qs.annotate(search_rank=RawSQL(
+            f"SELECT {RANK_SQL} FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND rowid = {table}.id",
+            (match,),
+            output_field=FloatField(),
+        ))
+
+    lookup = Q(nombre__icontains=q) | Q(descripcion__icontains=q) | Q(categoria__nombre__icontains=q)
+    q_slug = slugify(q)
+    if q_slug:
+        lookup |= Q(slug__icontains=q_slug)
+    return qs.filter(lookup).annotate(search_rank=Value(0.0, output_field=FloatField()))
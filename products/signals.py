@@ -0,0 +1,59 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from cotidjango import versioning
+
+from .categories import rebuild_category_closure, sync_category_closure
+from .models import Category, CategoryClosure, Offer, Product
+from .pricing import refresh_effective_prices, refresh_prices_for_offers
+from .search import index_products
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    refresh_effective_prices([instance.pk])
+    index_products([instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    index_products([instance.pk])
+
+
+@receiver(post_save, sender=Offer)
+@receiver(post_delete, sender=Offer)
+def offer_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    refresh_prices_for_offers([instance])
+
+
+@receiver(pre_delete, sender=Category)
+def category_deleting(sender, instance, **kwargs):
+    # al borrar la categoría sus productos quedan con categoria=NULL: se guardan
+    # antes para poder recalcularlos después
+    instance._affected_product_ids = list(instance.products.values_list("pk", flat=True))
+    instance._had_children = instance.children.exists()
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def category_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    if kwargs.get("signal") is post_save:
+        sync_category_closure(instance, created=kwargs.get("created", False))
+    elif getattr(instance, "_had_children", True):
+        # los hijos quedan como raíz (SET_NULL): sus ancestros viejos ya no valen
+        rebuild_category_closure()
+    else:
+        # hoja: el CASCADE ya quitó sus filas
+        versioning.bump(CategoryClosure)
+    product_ids = getattr(instance, "_affected_product_ids", None)
+    if product_ids is None:
+        product_ids = list(Product.objects.filter(categoria_id=instance.pk).values_list("pk", flat=True))
+    refresh_effective_prices(product_ids)
+    # el nombre de la categoría forma parte del índice de búsqueda de sus productos
+    index_products(product_ids)
@@ -0,0 +1,96 @@
+"""Asignación de slugs únicos (``base``, ``base-2``, ``base-3``...).
+
+En vez de probar sufijo por sufijo con un ``exists()`` cada uno, se traen de
+una vez todos los slugs ocupados con el mismo prefijo y se elige el primer
+sufijo libre. Un lote de objetos nuevos cuesta una consulta por cada
+``PREFIX_BATCH`` bases distintas. Si otro proceso inserta el mismo slug entre
+la consulta y el INSERT, ``save_with_unique_slug`` reintenta.
+"""
+import re
+from functools import reduce
+from operator import or_
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils.text import slugify
+
+PREFIX_BATCH = 200
+SAVE_ATTEMPTS = 3
+
+
+def slug_base(text, max_length, default="item"):
+    return slugify(str(text or ""))[:max_length].strip("-") or default
+
+
+class SlugAllocator:
+    """Reparte slugs libres de ``model.<field>``; recuerda los ya entregados (lotes sin guardar)."""
+
+    def __init__(self, model, field="slug", base_length=110, default="item"):
+        self.model = model
+        self.field = field
+        self.base_length = base_length
+        self.default = default
+        self.taken = {}
+        self.next_suffix = {}
+
+    def _load(self, bases, exclude_pk=None):
+        missing = [b for b in dict.fromkeys(bases) if b not in self.taken]
+        for start in range(0, len(missing), PREFIX_BATCH):
+            batch = missing[start:start + PREFIX_BATCH]
+            for base in batch:
+                self.taken[base] = set()
+                self.next_suffix[base] = 1
+            lookup = reduce(or_, (Q(**{f"{self.field}__startswith": f"{b}-"}) for b in batch))
+            qs = self.model._default_manager.filter(Q(**{f"{self.field}__in": batch}) | lookup)
+            if exclude_pk is not None:
+                qs = qs.exclude(pk=exclude_pk)
+            for slug in qs.values_list(self.field, flat=True).iterator():
+                self._mark(slug)
+
+    def _mark(self, slug):
+        if slug in self.taken:
+            self.taken[slug].add(1)
+        base, _, suffix = slug.rpartition("-")
+        # "base-1" no ocupa el lugar de "base": la numeración empieza en 2
+        if base in self.taken and re.fullmatch(r"\d+", suffix) and int(suffix) >= 2:
+            self.taken[base].add(int(suffix))
+
+    def _pick(self, base):
+        taken = self.taken[base]
+        n = self.next_suffix[base]
+        while n in taken:
+            n += 1
+        taken.add(n)
+        self.next_suffix[base] = n + 1
+        return base if n == 1 else f"{base}-{n}"
+
+    def allocate(self, texts, exclude_pk=None):
+        """Un slug libre por cada texto (en orden); los repetidos dentro del lote también se separan."""
+        bases = [slug_base(t, self.base_length, self.default) for t in texts]
+        self._load(bases, exclude_pk=exclude_pk)
+        return [self._pick(b) for b in bases]
+
+    def allocate_one(self, text, exclude_pk=None):
+        return self.allocate([text], exclude_pk=exclude_pk)[0]
+
+    def forget(self, base_text):
+        """Descarta lo conocido de una base (tras un choque con otro proceso)."""
+        base = slug_base(base_text, self.base_length, self.default)
+        self.taken.pop(base, None)
+        self.next_suffix.pop(base, None)
+
+
+def save_with_unique_slug(instance, text, save, base_length, field="slug", default="item"):
+    """Asigna un slug libre a ``instance`` y llama ``save()``; si el INSERT choca por el slug, reintenta."""
+    allocator = SlugAllocator(type(instance), field=field, base_length=base_length, default=default)
+    for attempt in range(SAVE_ATTEMPTS):
+        setattr(instance, field, allocator.allocate_one(text, exclude_pk=instance.pk))
+        try:
+            with transaction.atomic():
+                return save()
+        except IntegrityError:
+            slug = getattr(instance, field)
+            conflict = type(instance)._default_manager.filter(**{field: slug}).exclude(pk=instance.pk).exists()
+            if not conflict or attempt == SAVE_ATTEMPTS - 1:
+                raise
+            allocator.forget(text)
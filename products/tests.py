@@ -1,3 +1,38 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection
 from django.test import TestCase
 
-# Create your tests here.
+from .models import Product
+
+User = get_user_model()
+
+
+class CatalogResponseCacheTests(TestCase):
+    def setUp(self):
+        caches["catalog"].clear()
+        user = User.objects.create_user("cache", "cache@example.com", "x")
+        self.product = Product.objects.create(user=user, nombre="Viejo", precio=10, stock=5)
+
+    def name(self):
+        return self.client.get(f"/api/products/{self.product.pk}").json()["name"]
+
+    def write_from_other_process(self, nombre):
+        # lo que deja commiteado otro proceso (import job, otro worker): filas + versión
+        # de tabla, sin señales ni caches de este proceso de por medio
+        with connection.cursor() as cursor:
+            cursor.execute("UPDATE products_product SET nombre = %s WHERE id = %s", [nombre, self.product.pk])
+            cursor.execute(
+                "INSERT INTO cotidjango_tableversion (\"table\", version) VALUES ('products_product', 1) "
+                "ON CONFLICT (\"table\") DO UPDATE SET version = version + 1"
+            )
+
+    def test_cached_until_catalog_changes(self):
+        self.assertEqual(self.name(), "Viejo")
+        Product.objects.filter(pk=self.product.pk).update(nombre="Sin bump")
+        self.assertEqual(self.name(), "Viejo")
+
+    def test_write_from_other_process_invalidates(self):
+        self.assertEqual(self.name(), "Viejo")
+        self.write_from_other_process("Nuevo")
+        self.assertEqual(self.name(), "Nuevo")
@@ -4,12 +4,19 @@ from django.db import transaction, models
 from django.urls import reverse_lazy
 from django.views import generic
 from rest_framework import viewsets, permissions, filters
+from rest_framework.decorators import action
+from rest_framework.response import Response
 
+from .categories import category_list, category_tree, filter_by_category
 from .forms import ProductForm
 from .models import Product, Category, Offer
+from .pricing import filter_by_price, parse_price, refresh_stale_prices
+from .search import search_products
 from .serializers import ProductSerializer, CategorySerializer, OfferSerializer
 from orders.forms import OrderForm, OrderItemSimpleForm
 from orders.models import Order, OrderItem
+from orders.stock import OutOfStock, reserve_stock
+from cotidjango.response_cache import cache_catalog_response
 
 
 class CategoryViewSet(viewsets.ModelViewSet):
@@ -20,6 +27,19 @@ class CategoryViewSet(viewsets.ModelViewSet):
     filter_backends = [filters.SearchFilter]
     search_fields = ["nombre", "descripcion"]
 
+    @cache_catalog_response
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @cache_catalog_response
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    @action(detail=False, methods=["get"], url_path="tree")
+    @cache_catalog_response
+    def tree(self, request):
+        return Response(category_tree())
+
 
 class OfferViewSet(viewsets.ModelViewSet):
     queryset = Offer.objects.select_related("producto", "categoria").all()
@@ -34,27 +54,27 @@ class ProductViewSet(viewsets.ModelViewSet):
     queryset = Product.objects.select_related("user", "categoria").all()
     serializer_class = ProductSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
-    search_fields = ["nombre", "descripcion", "slug", "categoria__nombre"]
-    ordering_fields = ["creado_en", "precio", "nombre"]
+    # la búsqueda (`q` / `search`) la resuelve get_queryset con el índice FTS
+    filter_backends = [filters.OrderingFilter]
+    ordering_fields = ["creado_en", "precio", "nombre", "precio_final"]
 
     def get_queryset(self):
-        qs = super().get_queryset()
+        qs = super().get_queryset().annotate(precio_final=models.F("precio_efectivo__precio_final"))
         categoria = self.request.query_params.get("categoria")
         q = self.request.query_params.get("q") or self.request.query_params.get("search")
         activo = self.request.query_params.get("activo")
         if q:
-            qs = qs.filter(
-                models.Q(nombre__icontains=q)
-                | models.Q(descripcion__icontains=q)
-                | models.Q(slug__icontains=q)
-                | models.Q(categoria__nombre__icontains=q)
-            )
+            qs = search_products(qs, q).order_by("search_rank", "-creado_en")
         if categoria:
-            qs = qs.filter(categoria__slug=categoria)
+            qs = filter_by_category(qs, categoria)
         if activo is not None:
             qs = qs.filter(activo=str(activo).lower() in ["true", "1", "yes"])
-        return qs
+        min_price = parse_price(self.request.query_params.get("minPrice"))
+        max_price = parse_price(self.request.query_params.get("maxPrice"))
+        ordering = self.request.query_params.get("ordering") or ""
+        if min_price is not None or max_price is not None or "precio_final" in ordering:
+            refresh_stale_prices()
+        return filter_by_price(qs, min_price, max_price)
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -77,7 +97,7 @@ class StoreHomeView(generic.TemplateView):
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
         ctx["destacados"] = Product.objects.filter(activo=True).select_related("categoria")[:6]
-        ctx["categorias"] = Category.objects.all()
+        ctx["categorias"] = category_list()
         return ctx
 
 
@@ -91,14 +111,14 @@ class StoreListView(generic.ListView):
         cat = self.request.GET.get("categoria")
         q = self.request.GET.get("q")
         if cat:
-            qs = qs.filter(categoria__slug=cat)
+            qs = filter_by_category(qs, cat)
         if q:
-            qs = qs.filter(nombre__icontains=q)
+            qs = search_products(qs, q).order_by("search_rank", "-creado_en")
         return qs
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
-        ctx["categorias"] = Category.objects.all()
+        ctx["categorias"] = category_list()
         ctx["current_cat"] = self.request.GET.get("categoria") or ""
         ctx["q"] = self.request.GET.get("q") or ""
         ctx["static_categories"] = [
@@ -179,18 +199,24 @@ class StoreOrderView(generic.FormView):
         if not item_form.is_valid():
             return self.form_invalid(form)
 
-        with transaction.atomic():
-            order = form.save(commit=False)
-            if self.request.user.is_authenticated:
-                order.user = self.request.user
-            order.save()
-            product = item_form.cleaned_data["product"]
-            qty = item_form.cleaned_data["cantidad"]
-            OrderItem.objects.create(
-                order=order,
-                product=product,
-                cantidad=qty,
-                precio_unitario=product.precio,
-            )
-            order.recalc_total()
+        product = item_form.cleaned_data["product"]
+        qty = item_form.cleaned_data["cantidad"]
+        try:
+            with transaction.atomic():
+                reserve_stock({product.pk: qty})
+                order = form.save(commit=False)
+                if self.request.user.is_authenticated:
+                    order.user = self.request.user
+                order.stock_reservado = True
+                order.save()
+                OrderItem.objects.create(
+                    order=order,
+                    product=product,
+                    cantidad=qty,
+                    precio_unitario=product.precio,
+                )
+                order.recalc_total()
+        except OutOfStock as exc:
+            form.add_error(None, str(exc))
+            return self.form_invalid(form)
         return super().form_valid(form)
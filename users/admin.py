@@ -1,6 +1,8 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 
+from cotidjango import versioning
+
 from .models import CustomUser
 
 
@@ -28,3 +30,4 @@ class CustomUserAdmin(UserAdmin):
     @admin.action(description="Activar usuario")
     def activate_users(self, request, queryset):
         queryset.update(is_active=True)
+        versioning.bump(CustomUser)
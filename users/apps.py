@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'users'
+
+    def ready(self):
+        from cotidjango import versioning
+
+        from .models import CustomUser
+
+        versioning.track(CustomUser)
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.8 on 2026-10-16 22:41
+
+import cotidjango.storage
+import users.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customuser',
+            name='avatar',
+            field=models.ImageField(blank=True, null=True, storage=users.models.avatar_storage, upload_to='avatars/', validators=[cotidjango.storage.validate_upload]),
+        ),
+    ]
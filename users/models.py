@@ -1,6 +1,13 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
+from cotidjango.storage import ContentAddressedStorage, validate_upload
+
+
+def avatar_storage():
+    """Avatares: mismo storage direccionado por contenido que las imágenes de productos."""
+    return ContentAddressedStorage()
+
 
 class CustomUser(AbstractUser):
     ROLE_CHOICES = (
@@ -12,7 +19,9 @@ class CustomUser(AbstractUser):
     address = models.CharField(max_length=255, blank=True, default="")
     city = models.CharField(max_length=120, blank=True, default="")
     zip_code = models.CharField(max_length=20, blank=True, default="")
-    avatar = models.ImageField(upload_to="avatars/", blank=True, null=True)
+    avatar = models.ImageField(
+        upload_to="avatars/", storage=avatar_storage, validators=[validate_upload], blank=True, null=True
+    )
     role = models.CharField(max_length=10, choices=ROLE_CHOICES, default="user")
     groups = models.ManyToManyField(
         "auth.Group",
@@ -27,6 +36,9 @@ class CustomUser(AbstractUser):
         help_text="Permisos específicos para el usuario."
     )
 
+    class Meta(AbstractUser.Meta):
+        indexes = [models.Index(fields=["date_joined", "id"])]
+
     def save(self, *args, **kwargs):
         if self.is_superuser:
             self.role = "admin"